@@ -0,0 +1,65 @@
+# coding: utf-8
+"""
+Throughput of the escaping functions compared with the unescaped conversion to unicode,
+and of the rendering of a table with text cells.
+
+    python -m benchmarks.escaping
+    python -m benchmarks.escaping --rows 100000 --special
+"""
+import optparse
+import sys
+from timeit import default_timer
+
+from html_objects.components import Table
+from html_objects.escaping import escape, escape_many
+
+
+def rows(count, columns, special):
+    text = u'R&D <%s>' if special else u'Row %s'
+    return [[text % (row * columns + column) for column in range(columns)] for row in range(count)]
+
+
+def measure(name, function, data, cells):
+    start = default_timer()
+    function(data)
+    elapsed = default_timer() - start
+    sys.stdout.write('%-20s %10.3fs %14.0f cells/s\n' % (name, elapsed, cells / elapsed if elapsed else 0))
+
+
+def unescaped(data):
+    for row in data:
+        [unicode(cell) for cell in row]
+
+
+def escaped(data):
+    for row in data:
+        [escape(cell) for cell in row]
+
+
+def escaped_in_batch(data):
+    for row in data:
+        escape_many(row)
+
+
+def table(data):
+    Table.from_rows(iter(data)).as_html()
+
+
+def main(argv=None):
+    parser = optparse.OptionParser(usage='python -m benchmarks.escaping [options]')
+    parser.add_option('--rows', type='int', default=20000)
+    parser.add_option('--columns', type='int', default=10)
+    parser.add_option('--special', action='store_true', default=False, help='cells with characters to escape')
+    options, _ = parser.parse_args(argv)
+
+    data = rows(options.rows, options.columns, options.special)
+    cells = options.rows * options.columns
+    measure('unescaped', unescaped, data, cells)
+    measure('escape', escaped, data, cells)
+    measure('escape_many', escaped_in_batch, data, cells)
+    measure('table', table, data, cells)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
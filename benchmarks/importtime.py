@@ -0,0 +1,58 @@
+# coding: utf-8
+"""
+Import time of the modules used by short-lived processes, each import in a new interpreter.
+Fails (exit status 1) when the best time is over the budget, so it can guard the startup time in CI.
+
+    python -m benchmarks.importtime
+    python -m benchmarks.importtime --budget 10 --repeat 20 --module html_objects.components
+"""
+import compileall
+import optparse
+import os
+import subprocess
+import sys
+
+
+DEFAULT_MODULES = ['html_objects.components', 'html_objects.google']
+# Milliseconds, with the modules already compiled.
+DEFAULT_BUDGET = 5.0
+
+_IMPORT_CODE = '''
+from timeit import default_timer
+start = default_timer()
+import %s
+print((default_timer() - start) * 1000)
+'''
+
+
+def import_time(modules, repeat=10):
+    "Best time in milliseconds of importing @modules in @repeat new interpreters."
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    compileall.compile_dir(os.path.join(root, 'html_objects'), quiet=True) # the .pyc files are used as in production
+    env = dict(os.environ)
+    env.pop('PYTHONDONTWRITEBYTECODE', None)
+    times = []
+    for _ in range(repeat):
+        output = subprocess.check_output([sys.executable, '-c', _IMPORT_CODE % ', '.join(modules)], cwd=root, env=env)
+        times.append(float(output.strip()))
+    return min(times)
+
+
+def main(argv=None):
+    parser = optparse.OptionParser(usage='python -m benchmarks.importtime [options]')
+    parser.add_option('--module', action='append', dest='modules', help='module to import (default: %s)' % DEFAULT_MODULES)
+    parser.add_option('--repeat', type='int', default=10)
+    parser.add_option('--budget', type='float', default=DEFAULT_BUDGET, help='milliseconds')
+    options, _ = parser.parse_args(argv)
+
+    modules = options.modules or DEFAULT_MODULES
+    elapsed = import_time(modules, options.repeat)
+    sys.stdout.write('%-50s %8.2fms (budget %.2fms)\n' % (', '.join(modules), elapsed, options.budget))
+    if elapsed > options.budget:
+        sys.stdout.write('over budget\n')
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
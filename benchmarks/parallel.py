@@ -0,0 +1,60 @@
+# coding: utf-8
+"""
+Scaling of render_parallel with the number of worker processes, compared with as_html.
+
+    python -m benchmarks.parallel
+    python -m benchmarks.parallel --panels 32 --cells 20000
+"""
+import multiprocessing
+import optparse
+import sys
+from timeit import default_timer
+
+from concurrent.futures import ProcessPoolExecutor
+
+from html_objects.components import Page, Panel, Table
+
+
+def dashboard(panels, cells):
+    page = Page(u'Dashboard', u'Dashboard with many tables', u'benchmark')
+    for i in range(panels):
+        table = Table(clazz=u'panel-%s' % i)
+        for cell in range(cells):
+            if cell % 10 == 0:
+                table.start_line()
+            table.add_cell(cell)
+        page.body.add_component(Panel(table, clazz=u'panel'))
+    return page
+
+
+def main(argv=None):
+    parser = optparse.OptionParser(usage='python -m benchmarks.parallel [options]')
+    parser.add_option('--panels', type='int', default=16)
+    parser.add_option('--cells', type='int', default=10000)
+    parser.add_option('--max-workers', type='int', default=multiprocessing.cpu_count())
+    options, _ = parser.parse_args(argv)
+
+    page = dashboard(options.panels, options.cells)
+    start = default_timer()
+    expected = page.as_html()
+    serial = default_timer() - start
+    sys.stdout.write('%-10s %10.3fs\n' % ('serial', serial))
+
+    workers = 1
+    while workers <= options.max_workers:
+        page = dashboard(options.panels, options.cells)
+        executor = ProcessPoolExecutor(max_workers=workers)
+        try:
+            start = default_timer()
+            html = page.render_parallel(executor=executor, min_subtree_size=options.cells // 2)
+            elapsed = default_timer() - start
+        finally:
+            executor.shutdown()
+        assert html == expected
+        sys.stdout.write('%-10s %10.3fs  x%.2f\n' % ('%s workers' % workers, elapsed, serial / elapsed))
+        workers *= 2
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,133 @@
+# coding: utf-8
+"""
+Runs the benchmark workloads, each one in its own process, and reports build time, render time,
+elements/sec, bytes/sec and peak memory.
+
+    python -m benchmarks.run
+    python -m benchmarks.run --only table_10k --only large_select --repeat 5
+    python -m benchmarks.run --output new.json --compare old.json
+"""
+import json
+import multiprocessing
+import optparse
+import re
+import sys
+from timeit import default_timer
+
+try:
+    import resource
+except ImportError: # Windows
+    resource = None
+
+from benchmarks.workloads import WORKLOADS, LARGE_WORKLOADS
+
+
+_START_TAG = re.compile(r'<[a-zA-Z]')
+
+
+def count_elements(html):
+    "Number of elements (start tags) of @html: rows streamed in bulk render many elements without components."
+    return len(_START_TAG.findall(html))
+
+
+def peak_memory_kb():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak // 1024 if sys.platform == 'darwin' else peak
+
+
+def measure(workload, scale=1, repeat=3):
+    """
+    Best build and render times of @repeat runs. Every run renders a new tree.
+    """
+    build_time = render_time = None
+    for _ in range(repeat):
+        start = default_timer()
+        component = workload(scale)
+        built = default_timer()
+        html = component.as_html()
+        rendered = default_timer()
+        build_time = min(build_time, built - start) if build_time is not None else built - start
+        render_time = min(render_time, rendered - built) if render_time is not None else rendered - built
+    elements = count_elements(html)
+    size = len(html.encode('utf-8'))
+    return dict(
+        elements=elements,
+        bytes=size,
+        build_time=build_time,
+        render_time=render_time,
+        elements_per_sec=elements / render_time if render_time else None,
+        bytes_per_sec=size / render_time if render_time else None,
+        peak_memory_kb=peak_memory_kb(),
+    )
+
+
+def _measure_in_child(queue, name, scale, repeat):
+    workload = dict(WORKLOADS)[name]
+    queue.put(measure(workload, scale=scale, repeat=repeat))
+
+
+def measure_isolated(name, scale=1, repeat=3):
+    """
+    Measures the workload in a new process, so the peak memory is the one of the workload.
+    """
+    queue = multiprocessing.Queue()
+    process = multiprocessing.Process(target=_measure_in_child, args=(queue, name, scale, repeat))
+    process.start()
+    result = queue.get()
+    process.join()
+    return result
+
+
+def compare(results, previous, threshold):
+    """
+    Names of the workloads whose render time is more than @threshold slower than in @previous.
+    """
+    regressions = []
+    for name, result in results.items():
+        if name not in previous:
+            continue
+        old, new = previous[name]['render_time'], result['render_time']
+        ratio = new / old if old else 1.0
+        sys.stdout.write('%-20s %8.3fs -> %8.3fs  %+6.1f%%\n' % (name, old, new, (ratio - 1) * 100))
+        if ratio > 1 + threshold:
+            regressions.append(name)
+    return regressions
+
+
+def main(argv=None):
+    parser = optparse.OptionParser(usage='python -m benchmarks.run [options]')
+    parser.add_option('--only', action='append', default=[], help='workload to run (may be repeated)')
+    parser.add_option('--large', action='store_true', default=False, help='also run the large workloads')
+    parser.add_option('--scale', type='int', default=1)
+    parser.add_option('--repeat', type='int', default=3)
+    parser.add_option('--output', help='file where the JSON results are saved')
+    parser.add_option('--compare', help='JSON results of a previous run')
+    parser.add_option('--threshold', type='float', default=0.1, help='render time increase that is a regression')
+    options, _ = parser.parse_args(argv)
+
+    names = options.only or [name for name, _ in WORKLOADS if options.large or name not in LARGE_WORKLOADS]
+    results = {}
+    sys.stdout.write('%-20s %10s %10s %10s %14s %14s %12s\n' % (
+        'workload', 'elements', 'build(s)', 'render(s)', 'elements/s', 'bytes/s', 'peak(KB)'))
+    for name in names:
+        result = results[name] = measure_isolated(name, scale=options.scale, repeat=options.repeat)
+        sys.stdout.write('%-20s %10d %10.3f %10.3f %14.0f %14.0f %12s\n' % (
+            name, result['elements'], result['build_time'], result['render_time'],
+            result['elements_per_sec'] or 0, result['bytes_per_sec'] or 0, result['peak_memory_kb']))
+
+    if options.output:
+        with open(options.output, 'w') as output:
+            json.dump(results, output, indent=2, sort_keys=True)
+    if options.compare:
+        with open(options.compare) as previous:
+            regressions = compare(results, json.load(previous), options.threshold)
+        if regressions:
+            sys.stdout.write('Regressions: %s\n' % ', '.join(regressions))
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
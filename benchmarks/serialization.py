@@ -0,0 +1,55 @@
+# coding: utf-8
+"""
+Size and dump/load times of the trees of the workloads with html_objects.serialization and with pickle.
+
+    python -m benchmarks.serialization
+    python -m benchmarks.serialization --only table_10k --repeat 10
+"""
+import optparse
+import sys
+from timeit import default_timer
+
+try:
+    import cPickle as pickle
+except ImportError: # Python 3
+    import pickle
+
+from benchmarks.workloads import WORKLOADS, LARGE_WORKLOADS
+from html_objects.serialization import dumps, loads
+
+
+def best_time(function, argument, repeat):
+    times = []
+    for _ in range(repeat):
+        start = default_timer()
+        function(argument)
+        times.append(default_timer() - start)
+    return min(times)
+
+
+def pickle_dumps(component):
+    return pickle.dumps(component, pickle.HIGHEST_PROTOCOL)
+
+
+def main(argv=None):
+    parser = optparse.OptionParser(usage='python -m benchmarks.serialization [options]')
+    parser.add_option('--only', action='append', default=[], help='workload name (repeatable)')
+    parser.add_option('--repeat', type='int', default=5)
+    options, _ = parser.parse_args(argv)
+
+    sys.setrecursionlimit(100000) # pickle recurses into the children
+    sys.stdout.write('%-20s %-8s %12s %10s %10s\n' % ('workload', 'format', 'bytes', 'dump', 'load'))
+    for name, workload in WORKLOADS:
+        if options.only and name not in options.only or not options.only and name in LARGE_WORKLOADS:
+            continue
+        component = workload(1)
+        for format, dump, load in (('compact', dumps, loads), ('pickle', pickle_dumps, pickle.loads)):
+            data = dump(component)
+            sys.stdout.write('%-20s %-8s %12d %9.4fs %9.4fs\n' % (
+                name, format, len(data), best_time(dump, component, options.repeat),
+                best_time(load, data, options.repeat)))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
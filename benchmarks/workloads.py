@@ -0,0 +1,104 @@
+# coding: utf-8
+"""
+Representative component trees. Every workload receives a scale factor and returns a new tree.
+"""
+from html_objects.components import ComponentHtml, Page, Panel, Chunk, Link, Table, Form, TextBox, CheckBox, Select
+
+
+def page_with_assets(scale=1):
+    page = Page(u'Benchmark', u'Page with many assets', u'benchmark')
+    for i in range(200 * scale):
+        panel = Panel(clazz=u'widget')
+        panel.add_css_library(u'/css/widget-%s.css' % (i % 20))
+        panel.add_javascript_library(u'/js/widget-%s.js' % (i % 20))
+        panel.add_jquery_init_code(u'init_widget(%s);' % i)
+        panel.add_component(Chunk(u'Widget %s' % i))
+        panel.add_component(Link(u'/widget/%s' % i, u'details', target=u'_blank'))
+        page.body.add_component(panel)
+    return page
+
+
+def table(cells):
+    def workload(scale=1):
+        component = Table(clazz=u'report')
+        columns = 10
+        for column in range(columns):
+            component.add_cell_on_header(u'Column %s' % column)
+        for row in range(cells * scale // columns):
+            component.start_line()
+            for column in range(columns):
+                component.add_cell(row * column)
+        return component
+    workload.__name__ = 'table_%s' % cells
+    return workload
+
+
+def table_rows(cells, columns=10):
+    def workload(scale=1):
+        component = Table(clazz=u'report')
+        for column in range(columns):
+            component.add_cell_on_header(u'Column %s' % column)
+        component.add_rows([row * column for column in range(columns)] for row in range(cells * scale // columns))
+        return component
+    workload.__name__ = 'table_rows_%s' % cells
+    return workload
+
+
+def form_with_labels(scale=1):
+    form = Form(u'/save')
+    for i in range(300 * scale):
+        if i % 3 == 0:
+            field = TextBox(u'text-%s' % i, u'value %s' % i)
+        elif i % 3 == 1:
+            field = CheckBox(u'check-%s' % i)
+            field.set(u'value', i % 2 == 0)
+        else:
+            field = Select(u'select-%s' % i)
+            for option in range(5):
+                field.add_option(u'Option %s' % option, option)
+        form.add_component_with_label(u'Field %s' % i, field)
+    return form
+
+
+def large_select(scale=1):
+    select = Select(u'sku', multiple=True)
+    options = 20000 * scale
+    for i in range(options):
+        select.add_option(u'SKU %s' % i, i)
+    select.set(u'value', [unicode(i) for i in range(0, options, options // 500)])
+    return select
+
+
+def nested_panels(scale=1):
+    root = Panel(clazz=u'level-0')
+    panel = root
+    for level in range(1, 1000 * scale):
+        child = Panel(Chunk(u'level %s' % level), clazz=u'level-%s' % level)
+        panel.add_component(child)
+        panel = child
+    return root
+
+
+def attributes(scale=1):
+    root = ComponentHtml(u'div')
+    for i in range(20000 * scale):
+        root.add_component(ComponentHtml(u'span', u'x', clazz=u'cell', id=u'cell-%s' % i, title=u'title'))
+        root.add_component(ComponentHtml(u'br'))
+    return root
+
+
+WORKLOADS = [
+    ('page_with_assets', page_with_assets),
+    ('table_10k', table(10000)),
+    ('table_100k', table(100000)),
+    ('table_1m', table(1000000)),
+    ('table_rows_100k', table_rows(100000)),
+    ('table_rows_1m', table_rows(1000000, columns=50)),
+    ('form_with_labels', form_with_labels),
+    ('large_select', large_select),
+    ('nested_panels', nested_panels),
+    ('attributes', attributes),
+]
+
+# Too slow or too big to run by default.
+LARGE_WORKLOADS = ['table_1m', 'table_rows_1m']
@@ -0,0 +1,53 @@
+# coding: utf-8
+"""
+The components can be imported from the package, e.g. `from html_objects import Page, Table`.
+Their modules are imported when the names are first used, so importing the package is fast.
+"""
+import sys
+from types import ModuleType
+
+
+_COMPONENTS = ('ComponentHtml', 'SimpleComponentHtml', 'AsyncContent', 'Image', 'Link', 'Paragraph', 'UnorderedList',
+               'OrderedList', 'Chunk', 'Fragment', 'Panel', 'InformationPanel', 'Table', 'Form', 'TextBox', 'TextArea',
+               'CheckBox', 'UploadBox', 'Select', 'SubmitButton', 'HiddenField', 'Button', 'Head', 'Body', 'Page',
+               'render_html')
+# Public name -> module that defines it.
+LAZY_NAMES = dict((name, 'html_objects.components') for name in _COMPONENTS)
+LAZY_NAMES.update({
+    'Markup': 'html_objects.escaping',
+    'escape': 'html_objects.escaping',
+    'Template': 'html_objects.templates',
+    'Slot': 'html_objects.templates',
+    'parse_html': 'html_objects.parsing',
+    'LiveRenderer': 'html_objects.diffing',
+    'ScriptBundler': 'html_objects.bundles',
+    'GoogleAdSenseComponent': 'html_objects.google',
+    'GoogleAnalyticsComponent': 'html_objects.google',
+    'GoogleMapsComponent': 'html_objects.google',
+    'EmbedComponent': 'html_objects.google',
+    'register_embed': 'html_objects.google',
+})
+__all__ = sorted(LAZY_NAMES)
+
+
+class _LazyModule(ModuleType):
+    "The package module, which imports the module of a name of LAZY_NAMES when the name is first used."
+
+    def __getattr__(self, name):
+        try:
+            module_name = LAZY_NAMES[name]
+        except KeyError:
+            raise AttributeError("'module' object has no attribute '%s'" % name)
+        value = getattr(__import__(module_name, fromlist=[name]), name)
+        setattr(self, name, value)
+        return value
+
+    def __dir__(self):
+        return sorted(set(self.__dict__) | set(LAZY_NAMES))
+
+
+_module = _LazyModule(__name__, __doc__)
+_module.__dict__.update(dict((name, value) for name, value in globals().items() if name != '_module'))
+# The original module is kept, otherwise Python 2 clears its globals, used by the functions above.
+_module._original_module = sys.modules[__name__]
+sys.modules[__name__] = _module
@@ -0,0 +1,73 @@
+# coding: utf-8
+import hashlib
+import re
+
+from html_objects.cache import LocalCacheBackend
+from html_objects.components import ComponentHtml
+
+
+_blank_lines = re.compile(u'\n\\s*\n')
+
+
+def strip_whitespace(code):
+    """
+    Removes the indentation, the trailing whitespace and the blank lines of the javascript @code.
+    Lines are kept, so statements without semicolon still work. Multi-line string literals are changed too.
+    """
+    lines = [line.strip() for line in code.splitlines()]
+    return u'\n'.join(line for line in lines if line)
+
+
+def content_hash(content):
+    return hashlib.sha1(content.encode('utf-8')).hexdigest()[:16]
+
+
+class ScriptBundle(object):
+    """
+    Immutable javascript code of a page, identified by the @hash of its source code, by default of its content.
+    """
+    def __init__(self, content, hash=None):
+        self.content = content
+        self.hash = hash if hash is not None else content_hash(content)
+        self.filename = u'bundle-%s.js' % self.hash
+        # <script> of the bundle, rendered once by the ScriptBundler.
+        self.tag = None
+
+
+class ScriptBundler(object):
+    """
+    Bundles of the scripts of the pages, cached by content, so the same script is not built again.
+    Without @url, the <script> of the bundle is inlined. With @url, e.g. u'/static/js/%s', the <script>
+    points to the url of the filename of the bundle, whose content must be served with get(hash).
+    @minify: function that converts the code, e.g. strip_whitespace. The result is memoized.
+    @backend: html_objects.cache.CacheBackend of the bundles.
+    """
+    def __init__(self, url=None, minify=None, backend=None):
+        self.url = url
+        self.minify = minify
+        self.backend = backend if backend is not None else LocalCacheBackend()
+
+    def bundle(self, code):
+        """
+        ScriptBundle of the javascript @code, identified by the hash of @code. It is stored in a single entry,
+        read by every render and by get, so a bundle whose pages are rendered stays in the cache.
+        """
+        hash = content_hash(code)
+        key = 'bundle-%s' % hash
+        bundle = self.backend.get(key)
+        if bundle is None:
+            bundle = ScriptBundle(self.minify(code) if self.minify else code, hash)
+            if self.url is None:
+                bundle.tag = u'<script type="text/javascript">%s</script>' % bundle.content
+            else:
+                bundle.tag = ComponentHtml.tag(u'script', u'', type=u'text/javascript', src=self.url % bundle.filename)
+            self.backend.set(key, bundle)
+        return bundle
+
+    def get(self, hash):
+        "ScriptBundle with the @hash, e.g. to serve its content, or None if it is not cached."
+        return self.backend.get('bundle-%s' % hash)
+
+    def script_tag(self, code):
+        "<script> of the bundle of the javascript @code."
+        return self.bundle(code).tag
@@ -0,0 +1,138 @@
+# coding: utf-8
+import time
+
+
+def _ordered_dict():
+    "Imported when the first store is used, collections is slow to import."
+    try:
+        from collections import OrderedDict
+    except ImportError: # Python 2.6
+        return {}
+    return OrderedDict()
+
+
+class CacheBackend(object):
+    """
+    Interface of the stores used by FragmentCache.
+    """
+    def get(self, key):
+        "Value stored with @key or None."
+        raise NotImplementedError()
+
+    def set(self, key, value):
+        raise NotImplementedError()
+
+    def delete(self, key):
+        raise NotImplementedError()
+
+    def clear(self):
+        raise NotImplementedError()
+
+
+class LocalCacheBackend(CacheBackend):
+    """
+    In-process store that evicts the least recently used entries when it has more than @max_size entries
+    and the entries older than @ttl seconds.
+    """
+    def __init__(self, max_size=1000, ttl=None, timer=time.time):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.timer = timer
+        self._entries = _ordered_dict()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key):
+        try:
+            expires_at, value = self._entries.pop(key)
+        except KeyError:
+            return None
+        if expires_at is not None and expires_at <= self.timer():
+            return None
+        self._entries[key] = (expires_at, value)
+        return value
+
+    def set(self, key, value):
+        expires_at = self.timer() + self.ttl if self.ttl else None
+        self._entries.pop(key, None)
+        self._entries[key] = (expires_at, value)
+        while len(self._entries) > self.max_size:
+            if type(self._entries) is not dict:
+                self._entries.popitem(last=False)
+            else:
+                self._entries.popitem()
+
+    def delete(self, key):
+        self._entries.pop(key, None)
+
+    def clear(self):
+        self._entries.clear()
+
+
+class MemcachedCacheBackend(CacheBackend):
+    """
+    Adapter for memcached-like clients (get, set, delete and flush_all), e.g. python-memcached or pylibmc.
+    """
+    def __init__(self, client, prefix='html_objects:', ttl=0):
+        self.client = client
+        self.prefix = prefix
+        self.ttl = ttl
+
+    def _key(self, key):
+        return '%s%s' % (self.prefix, key)
+
+    def get(self, key):
+        return self.client.get(self._key(key))
+
+    def set(self, key, value):
+        self.client.set(self._key(key), value, self.ttl)
+
+    def delete(self, key):
+        self.client.delete(self._key(key))
+
+    def clear(self):
+        self.client.flush_all()
+
+
+class FragmentCache(object):
+    """
+    Rendered HTML and assets of components created with a cache_key.
+    """
+    def __init__(self, backend=None):
+        self._backend = backend
+        self.hits = 0
+        self.misses = 0
+
+    def _get_backend(self):
+        "LocalCacheBackend by default, created when it is first used."
+        if self._backend is None:
+            self._backend = LocalCacheBackend()
+        return self._backend
+
+    def _set_backend(self, backend):
+        self._backend = backend
+
+    backend = property(_get_backend, _set_backend)
+
+    def get(self, key):
+        value = self.backend.get(key)
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    def set(self, key, value):
+        self.backend.set(key, value)
+
+    def delete(self, key):
+        self.backend.delete(key)
+
+    def clear(self):
+        self.backend.clear()
+        self.hits = 0
+        self.misses = 0
+
+    def stats(self):
+        return dict(hits=self.hits, misses=self.misses)
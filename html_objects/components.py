@@ -1,46 +1,840 @@
 # coding: utf-8
+import sys
+import weakref
 from copy import copy
 
+from html_objects.cache import FragmentCache
+from html_objects.escaping import Markup, escape, escape_many, needs_escaping
 
-class ComponentHtml(object):
+
+DEFAULT_CHUNK_SIZE = 8192
+# Mark of the clones whose child components are still the ones of the cloned component.
+CHILD_COMPONENTS = 'child_components'
+# Longer fragments are not looked up in the encoded static fragments.
+MAX_STATIC_FRAGMENT_SIZE = 256
+# Components keep their HTML as one string only if none of its fragments is longer, see KeptHtml.
+MAX_JOINED_FRAGMENT_SIZE = 4096
+
+try:
+    StopAsyncIteration = StopAsyncIteration
+except NameError: # Python 2
+    class StopAsyncIteration(Exception):
+        "Exception of the future returned by __anext__ at the end of an asynchronous iterator."
+
+
+class EmptyAttributes(dict):
     """
-    <TAG></TAG>
+    Immutable empty dict shared by the components created without attributes.
     """
-    def __init__(self, tag_name, innerHtml='', **kwargs):
-        self.tag_name = tag_name
-        self.innerHtml = innerHtml
-        self.kwargs = kwargs
+    def _immutable(self, *args, **kwargs):
+        raise TypeError('EmptyAttributes is immutable, use ComponentHtml.set')
+
+    __setitem__ = __delitem__ = setdefault = update = pop = popitem = clear = _immutable
+
+    def __reduce__(self):
+        return 'EMPTY_ATTRIBUTES'
+
+
+EMPTY_ATTRIBUTES = EmptyAttributes()
+
+
+class KeptHtml(object):
+    """
+    HTML kept by a component with a fragment longer than MAX_JOINED_FRAGMENT_SIZE: its own fragments
+    and the kept HTML (strings or KeptHtml) of its children, referenced instead of joined, so the HTML
+    of deep trees is not copied again at every level. Iterating it yields the strings in document order.
+    """
+    __slots__ = ('fragments', 'size')
+
+    def __init__(self, fragments):
+        self.fragments = fragments
+        self.size = sum(map(len, fragments))
+
+    def __len__(self):
+        return self.size
+
+    def __iter__(self):
+        stack = [iter(self.fragments)]
+        while stack:
+            for fragment in stack[-1]:
+                if isinstance(fragment, KeptHtml):
+                    stack.append(iter(fragment.fragments))
+                    break
+                yield fragment
+            else:
+                stack.pop()
+
+
+def _keep_html(component, buffer, start):
+    """
+    Replaces the fragments of @component in @buffer (from @start) by the HTML it keeps, and returns it.
+    """
+    fragments = buffer[start:]
+    for fragment in fragments:
+        if len(fragment) > MAX_JOINED_FRAGMENT_SIZE:
+            html = KeptHtml(fragments)
+            break
+    else:
+        html = u''.join(fragments)
+    component._html = html
+    del buffer[start:]
+    buffer.append(html)
+    return html
+
+
+def _expand_kept_html(buffer, start):
+    "Replaces the KeptHtml in @buffer (from @start) by their strings."
+    fragments = buffer[start:]
+    del buffer[start:]
+    for fragment in fragments:
+        if isinstance(fragment, KeptHtml):
+            buffer.extend(fragment)
+        else:
+            buffer.append(fragment)
 
-        # Every component may have associated scripts.
+
+class AssetRegistry(object):
+    """
+    CSS and javascript libraries of a component tree, each one kept once in first-seen order,
+    plus the javascript and jQuery init code of the tree in document order.
+    """
+    def __init__(self):
         self.css_libraries = []
         self.javascript_libraries = []
-        self._script = ''
-        self.jquery_init_code = ''
+        self._css_libraries_set = set()
+        self._javascript_libraries_set = set()
+        self._scripts = []
+        self._jquery_init_codes = []
+
+    @property
+    def javascript_code(self):
+        return u''.join(self._scripts)
+
+    @property
+    def jquery_init_code(self):
+        return u''.join(self._jquery_init_codes)
+
+    def add_css_library(self, href):
+        if href not in self._css_libraries_set:
+            self._css_libraries_set.add(href)
+            self.css_libraries.append(href)
+
+    def add_javascript_library(self, src):
+        if src not in self._javascript_libraries_set:
+            self._javascript_libraries_set.add(src)
+            self.javascript_libraries.append(src)
+
+    def add_javascript_code(self, src):
+        if src:
+            self._scripts.append(src)
+
+    def add_jquery_init_code(self, src):
+        if src:
+            self._jquery_init_codes.append(src)
+
+    def add_component_assets(self, component):
+        """
+        Adds the assets of @component itself, not the ones of its children.
+        """
+        if component._assets is not None:
+            self.merge(component._assets)
+
+    def __copy__(self):
+        registry = AssetRegistry()
+        registry.merge(self)
+        return registry
+
+    def merge(self, registry):
+        for href in registry.css_libraries:
+            self.add_css_library(href)
+        for src in registry.javascript_libraries:
+            self.add_javascript_library(src)
+        self._scripts.extend(registry._scripts)
+        self._jquery_init_codes.extend(registry._jquery_init_codes)
+
+
+class ComponentHtml(object):
+    """
+    <TAG></TAG>
+    """
+    # Compact nodes: subclasses must declare __slots__ too.
+    __slots__ = ('tag_name', 'cache_key', 'kwargs', '_children', '_html', '_parents', '_assets', '_copy_on_write',
+                 '_clones', '_clone_epoch', '__weakref__')
+
+    # Python keyword names of attributes that are not valid identifiers in HTML.
+    ATTRIBUTE_NAMES = {
+        'clazz': u'class',
+        'xml_lang': u'xml:lang',
+        'http_equiv': u'http-equiv',
+    }
+    # Rendering caches, keyed by attribute and tag names.
+    _attribute_prefixes = {}
+    _start_tags = {}
+    _end_tags = {}
+    _state_slots_cache = {}
+    # unicode -> UTF-8 of the static fragments, see register_static_fragments.
+    _utf8_fragments = {}
+    # Functions that return static fragments, registered when the first tree is encoded, not on import.
+    _static_fragment_factories = []
+    # HTML and assets of the components created with a cache_key.
+    fragment_cache = FragmentCache()
+    # False for components whose HTML may change without a call to changed(), e.g. streams.
+    cacheable = True
+    # html_objects.profiling.RenderHook called by render for every component, e.g. a RenderProfiler.
+    render_hook = None
+    # Slots with containers that clone() shares with the copy. Subclasses extend it with their own containers.
+    shared_slots = ('kwargs', '_children', '_assets')
+    # Slots that _rebuild_derived_slots computes from the others, so html_objects.serialization does not store them.
+    derived_slots = ()
+    # Number of clones made, so components that were not changed since the last clone skip _will_change.
+    _clones_made = 0
 
-        self.propagate_scripts(innerHtml)
+    def __init__(self, tag_name, innerHtml='', **kwargs):
+        """
+        @cache_key: the component renders the same HTML for the same key, so its HTML and assets
+        are stored in the fragment_cache. Use it only for components that will not change.
+        """
+        self.tag_name = tag_name
+        self.cache_key = kwargs.pop('cache_key', None) if kwargs else None
+        self.kwargs = kwargs or EMPTY_ATTRIBUTES
+        # Children are kept as nodes (components or strings) and rendered only when the root is rendered.
+        self._children = ()
+        # HTML of the last render, until the component or a descendant changes.
+        self._html = None
+        # Weak references to the components that have this one as a child.
+        self._parents = ()
+        # Every component may have associated scripts. They are collected from the whole tree when it is rendered.
+        self._assets = None
+        # Names of the shared_slots whose containers are shared with a clone, copied before they are changed.
+        # CHILD_COMPONENTS if the child components are the ones of the cloned component.
+        self._copy_on_write = ()
+        # Weak references to the clones of the component, that may still share its descendants.
+        self._clones = ()
+        self._clone_epoch = ComponentHtml._clones_made
+        if innerHtml != '':
+            self.add_component(innerHtml)
 
     def __str__(self):
         return self.as_html()
 
+    def __html__(self):
+        return self.as_html()
+
+    @classmethod
+    def _state_slots(cls):
+        try:
+            return ComponentHtml._state_slots_cache[cls]
+        except KeyError:
+            names = []
+            for klass in cls.__mro__:
+                for name in klass.__dict__.get('__slots__', ()):
+                    if name not in ('__weakref__', '_parents', '_html', '_copy_on_write', '_clones', '_clone_epoch'):
+                        names.append(name)
+            ComponentHtml._state_slots_cache[cls] = names
+            return names
+
+    def __getstate__(self):
+        "The rendered HTML and the references to parents are not pickled."
+        state = dict((name, getattr(self, name)) for name in self._state_slots() if hasattr(self, name))
+        if hasattr(self, '__dict__'):
+            state.update(self.__dict__)
+        return state
+
+    def __setstate__(self, state):
+        for name, value in state.iteritems():
+            setattr(self, name, value)
+        self._html = None
+        self._parents = ()
+        self._copy_on_write = ()
+        self._clones = ()
+        self._clone_epoch = ComponentHtml._clones_made
+        for child in self.child_components():
+            child.add_parent(self)
+
+    def _get_children(self):
+        """
+        Nodes of the component. The child components of a clone are cloned when they are first reached,
+        so they can be changed without changing the cloned tree.
+        """
+        if CHILD_COMPONENTS in self._copy_on_write:
+            children = self._writable('_children')
+            clones = {}
+            for index, child in enumerate(children):
+                if isinstance(child, ComponentHtml) and not child.has_parent(self):
+                    clone = clones[id(child)] = children[index] = child.clone()
+                    clone.add_parent(self)
+            self._copy_on_write = tuple(name for name in self._copy_on_write if name != CHILD_COMPONENTS)
+            self._children_cloned(clones)
+        return self._children
+
+    def _set_children(self, children):
+        self._will_change()
+        self._children = children
+        self._copy_on_write = tuple(name for name in self._copy_on_write if name not in ('_children', CHILD_COMPONENTS))
+
+    children = property(_get_children, _set_children)
+
+    def _writable(self, name):
+        """
+        Container of the slot @name, copied first if it is shared with a clone.
+        """
+        self._will_change()
+        value = getattr(self, name)
+        if name in self._copy_on_write:
+            value = copy(value)
+            setattr(self, name, value)
+            self._copy_on_write = tuple(shared for shared in self._copy_on_write if shared != name)
+        return value
+
+    def _own_child(self, child):
+        """
+        @child, or its clone in its position if it is a child component of the cloned component.
+        """
+        if CHILD_COMPONENTS not in self._copy_on_write or child.has_parent(self):
+            return child
+        return self._clone_child(self._children.index(child))
+
+    def _clone_child(self, index):
+        children = self._writable('_children')
+        child = children[index]
+        clone = children[index] = child.clone()
+        clone.add_parent(self)
+        self._children_cloned({id(child): clone})
+        return clone
+
+    def _will_change(self):
+        """
+        Called before the component changes: the clones of its ancestors that still share it
+        clone the path down to it, so they keep the component as it is.
+        """
+        if self._clone_epoch == ComponentHtml._clones_made:
+            return
+        stack = [(self, ())]
+        while stack:
+            component, path = stack.pop()
+            path = (component,) + path
+            for parent in component._parents:
+                parent = parent()
+                if parent is not None:
+                    if parent._clones:
+                        parent._unshare(path)
+                    stack.append((parent, path))
+        self._clone_epoch = ComponentHtml._clones_made
+
+    def _unshare(self, path):
+        """
+        Clones in the clones of this component the components of @path (a child, a child of it...)
+        that they still share.
+        """
+        for clone in self._clones:
+            clone = clone()
+            if clone is None:
+                continue
+            # Clones of the clone that were made before it cloned its children share them too.
+            if clone._clones:
+                clone._unshare(path)
+            node = clone
+            for component in path:
+                if CHILD_COMPONENTS not in node._copy_on_write or component.has_parent(node):
+                    break
+                try:
+                    index = node._children.index(component)
+                except ValueError:
+                    break
+                node = node._clone_child(index)
+
+    def _children_cloned(self, clones):
+        """
+        Called when the child components of a clone are cloned, with the dict id(child) -> clone.
+        Subclasses with attributes that reference children must update them here.
+        """
+        pass
+
+    def _rebuild_derived_slots(self):
+        "Sets the derived_slots from the other slots, when the component is deserialized."
+        pass
+
+    def _get_inner_html(self):
+        buffer = []
+        for child in self._children:
+            if isinstance(child, ComponentHtml):
+                child.render(buffer)
+            else:
+                buffer.append(unicode(child))
+        return u''.join(buffer)
+
+    def _set_inner_html(self, innerHtml):
+        self.children = ()
+        if innerHtml != '':
+            self.add_component(innerHtml)
+        self.changed()
+
+    innerHtml = property(_get_inner_html, _set_inner_html)
+
     def as_html(self):
-        return ComponentHtml.tag(self.tag_name, self.innerHtml, **self.kwargs)
+        buffer = []
+        self.render(buffer)
+        return u''.join(buffer)
+
+    def render(self, buffer):
+        """
+        Appends the HTML fragments of the component tree to @buffer (a list).
+        Components with children keep their HTML until they or a descendant change,
+        so unchanged subtrees are not rendered again.
+        Every component is reported to the render_hook, if there is one.
+        """
+        hook = ComponentHtml.render_hook
+        html = self.cached_fragment()[0] if self.cache_key is not None else self._html
+        if html is not None:
+            if isinstance(html, KeptHtml):
+                buffer.extend(html)
+            else:
+                buffer.append(html)
+            if hook is not None:
+                hook.component_reused(self, None, len(html))
+            return
+        if hook is not None:
+            from timeit import default_timer # imported only when rendering is profiled
+            hook.component_started(self)
+        render_start = len(buffer)
+        # KeptHtml were added to the buffer, they are replaced by their strings at the end.
+        kept = False
+        # Frames: [parts, component, buffer start, has component children, cacheable, start time, children time]
+        # With a hook, the start time is taken before html_parts is called, so its time is counted too.
+        frame = [None, self, render_start, False, self.cacheable, default_timer() if hook is not None else 0.0, 0.0]
+        frame[0] = iter(self.html_parts())
+        stack = [frame]
+        while stack:
+            frame = stack[-1]
+            for part in frame[0]:
+                if isinstance(part, ComponentHtml):
+                    frame[3] = True
+                    html = part.cached_fragment()[0] if part.cache_key is not None else part._html
+                    if html is not None:
+                        buffer.append(html)
+                        if type(html) is KeptHtml:
+                            kept = True
+                        if hook is not None:
+                            hook.component_reused(part, frame[1], len(html))
+                        continue
+                    if hook is None:
+                        stack.append([iter(part.html_parts()), part, len(buffer), False, part.cacheable, 0.0, 0.0])
+                        break
+                    hook.component_started(part)
+                    frame = [None, part, len(buffer), False, part.cacheable, default_timer(), 0.0]
+                    frame[0] = iter(part.html_parts())
+                    stack.append(frame)
+                    break
+                buffer.append(unicode(part))
+            else:
+                stack.pop()
+                component, start = frame[1], frame[2]
+                if not frame[4]:
+                    if stack:
+                        stack[-1][4] = False
+                elif frame[3] and type(_keep_html(component, buffer, start)) is KeptHtml:
+                    kept = True
+                if hook is not None:
+                    elapsed = default_timer() - frame[5]
+                    parent = None
+                    if stack:
+                        parent = stack[-1][1]
+                        stack[-1][6] += elapsed
+                    hook.component_rendered(component, parent, elapsed, elapsed - frame[6],
+                                            sum(map(len, buffer[start:])))
+        if kept:
+            _expand_kept_html(buffer, render_start)
+
+    def iter_html(self):
+        """
+        Iterator of the HTML fragments of the component tree, in document order.
+        """
+        return ComponentHtml.walk_html([self])
+
+    @classmethod
+    def walk_html(cls, parts, component=None):
+        """
+        Generator of the HTML of @parts, expanding the components.
+        The tree is walked with an explicit stack, so deep trees do not hit the recursion limit.
+        Components are reported to the render_hook, if there is one, with @component (the component
+        of the @parts, if any) as the parent of the first level. Their time includes the time of the consumer.
+        """
+        hook = ComponentHtml.render_hook
+        if hook is not None:
+            from timeit import default_timer # imported only when rendering is profiled
+        # Characters yielded so far, for the hook
+        size = 0
+        # Frames: [parts, component, size before it, start time, children time]
+        stack = [[iter(parts), component, 0, 0.0, 0.0]]
+        while stack:
+            frame = stack[-1]
+            for part in frame[0]:
+                if isinstance(part, ComponentHtml):
+                    html = part.cached_fragment()[0] if part.cache_key is not None else part._html
+                    if html is not None:
+                        if hook is not None:
+                            hook.component_reused(part, frame[1], len(html))
+                            size += len(html)
+                        if isinstance(html, KeptHtml):
+                            for fragment in html:
+                                yield fragment
+                        else:
+                            yield html
+                        continue
+                    if hook is None:
+                        stack.append([iter(part.html_parts()), part, 0, 0.0, 0.0])
+                        break
+                    hook.component_started(part)
+                    frame = [None, part, size, default_timer(), 0.0]
+                    frame[0] = iter(part.html_parts())
+                    stack.append(frame)
+                    break
+                part = unicode(part)
+                if hook is not None:
+                    size += len(part)
+                yield part
+            else:
+                stack.pop()
+                if hook is not None and stack:
+                    elapsed = default_timer() - frame[3]
+                    stack[-1][4] += elapsed
+                    hook.component_rendered(frame[1], stack[-1][1], elapsed, elapsed - frame[4], size - frame[2])
+
+    def cached_fragment(self):
+        """
+        (html, AssetRegistry) of the component, from the fragment_cache when possible.
+        """
+        fragment = self.fragment_cache.get(self.cache_key)
+        if fragment is None:
+            html = u''.join(ComponentHtml.walk_html(self.html_parts(), self))
+            fragment = (html, self._collect_assets(AssetRegistry()))
+            self.fragment_cache.set(self.cache_key, fragment)
+        return fragment
+
+    def compile(self):
+        """
+        html_objects.templates.Template of the component tree: the HTML of the tree is pre-rendered
+        and only the Slots are rendered by Template.render.
+        """
+        from html_objects.templates import Template # templates imports this module
+        return Template.from_component(self)
+
+    @classmethod
+    def from_html(cls, markup):
+        """
+        Component tree of the HTML @markup, with the classes of this module (Panel, Link, Table, Form...).
+        See html_objects.parsing: trees are cached by the hash of the markup, so each markup is parsed once.
+        """
+        from html_objects.parsing import parse_html # parsing imports this module
+        return parse_html(markup)
+
+    def render_parallel(self, executor=None, min_subtree_size=1000):
+        """
+        HTML of the component tree, the same of as_html, rendering independent subtrees in @executor,
+        a concurrent.futures executor (by default, a new ProcessPoolExecutor).
+        Only subtrees with at least @min_subtree_size components are sent to the executor: the smallest ones
+        that have no child that big. Assets are collected in this process, as in as_html, so the head of a page
+        is rendered in this process too.
+        """
+        sizes = {}
+        order = []
+        stack = [self]
+        while stack:
+            component = stack.pop()
+            order.append(component)
+            stack.extend(component.child_components())
+        subtrees = set()
+        for component in reversed(order):
+            children_sizes = [sizes[id(child)] for child in component.child_components()]
+            size = sizes[id(component)] = 1 + sum(children_sizes)
+            if size >= min_subtree_size and max(children_sizes or [0]) < min_subtree_size:
+                subtrees.add(id(component))
+        if not subtrees or id(self) in subtrees:
+            return self.as_html()
+
+        own_executor = executor is None
+        if own_executor:
+            from concurrent.futures import ProcessPoolExecutor
+            executor = ProcessPoolExecutor()
+        try:
+            # unicode fragments and futures of the subtrees, in document order
+            buffer = []
+            stack = [iter(self.html_parts())]
+            while stack:
+                for part in stack[-1]:
+                    if isinstance(part, ComponentHtml):
+                        if part.cache_key is not None:
+                            buffer.append(part.cached_fragment()[0])
+                        elif isinstance(part._html, KeptHtml):
+                            buffer.extend(part._html)
+                        elif part._html is not None:
+                            buffer.append(part._html)
+                        elif id(part) in subtrees and not isinstance(part, Head):
+                            buffer.append(executor.submit(render_html, part))
+                        else:
+                            stack.append(iter(part.html_parts()))
+                            break
+                        continue
+                    buffer.append(unicode(part))
+                else:
+                    stack.pop()
+            return u''.join(fragment if isinstance(fragment, unicode) else fragment.result() for fragment in buffer)
+        finally:
+            if own_executor:
+                executor.shutdown()
+
+    def iter_bytes(self, encoding='utf-8'):
+        """
+        Iterator of the HTML fragments of the component tree encoded with @encoding.
+        The static fragments registered with register_static_fragments are encoded only once.
+        """
+        if encoding.lower().replace('-', '').replace('_', '') != 'utf8':
+            return (fragment.encode(encoding) for fragment in self.iter_html())
+        return ComponentHtml._encode_utf8(self.iter_html())
+
+    @classmethod
+    def _encode_utf8(cls, fragments):
+        while ComponentHtml._static_fragment_factories:
+            ComponentHtml.register_static_fragments(*ComponentHtml._static_fragment_factories.pop()())
+        encoded_fragments = ComponentHtml._utf8_fragments
+        for fragment in fragments:
+            if len(fragment) <= MAX_STATIC_FRAGMENT_SIZE:
+                data = encoded_fragments.get(fragment)
+                if data is not None:
+                    yield data
+                    continue
+            yield fragment.encode('utf-8')
+
+    def as_bytes(self, encoding='utf-8'):
+        """
+        HTML encoded with @encoding. The tree is encoded fragment by fragment, the HTML is never held as unicode.
+        """
+        return b''.join(self.iter_bytes(encoding))
+
+    def render_bytes(self, buffer, encoding='utf-8'):
+        """
+        Writes the encoded HTML into @buffer: a bytearray is extended, fragments are appended to a list,
+        e.g. for socket.sendmsg or os.writev, and they are written into other file-like objects, e.g. io.BytesIO.
+        """
+        if isinstance(buffer, bytearray):
+            add = buffer.extend
+        elif isinstance(buffer, list):
+            add = buffer.append
+        else:
+            add = buffer.write
+        for data in self.iter_bytes(encoding):
+            add(data)
+
+    @classmethod
+    def register_static_fragments(cls, *fragments):
+        """
+        Fragments (unicode strings) rendered by many components, whose UTF-8 encoding is kept.
+        """
+        for fragment in fragments:
+            if len(fragment) <= MAX_STATIC_FRAGMENT_SIZE:
+                ComponentHtml._utf8_fragments[fragment] = fragment.encode('utf-8')
+
+    def iter_chunks(self, chunk_size=DEFAULT_CHUNK_SIZE, encoding='utf-8'):
+        """
+        Generator of the HTML grouped in chunks of at least @chunk_size bytes encoded with @encoding,
+        or of @chunk_size characters if @encoding is None. Useful as a WSGI response body.
+        """
+        if encoding:
+            chunk = []
+            size = 0
+            for data in self.iter_bytes(encoding):
+                chunk.append(data)
+                size += len(data)
+                if size >= chunk_size:
+                    yield b''.join(chunk)
+                    chunk = []
+                    size = 0
+            if chunk:
+                yield b''.join(chunk)
+            return
+        chunk = []
+        size = 0
+        for fragment in self.iter_html():
+            chunk.append(fragment)
+            size += len(fragment)
+            if size >= chunk_size:
+                yield u''.join(chunk)
+                chunk = []
+                size = 0
+        if chunk:
+            yield u''.join(chunk)
+
+    def async_iter_html(self, chunk_size=DEFAULT_CHUNK_SIZE):
+        """
+        Generator of the HTML grouped in chunks of at least @chunk_size characters, for event loops.
+        Parts of the tree that wait for data (AsyncContent, Table.stream_rows_async, Select.add_options_async)
+        yield the pending future (an object with done() and result(), e.g. of concurrent.futures, tornado or trollius)
+        after the HTML rendered so far. The caller must wait for the future before resuming the generator,
+        e.g. yielding it in a tornado coroutine, so the event loop is not blocked while the data arrives.
+        """
+        chunk = []
+        size = 0
+        # Result (or exc_info) of the last future, sent (or thrown) into the html_parts that yielded it.
+        result = error = _NOTHING = object()
+        stack = [iter([self])]
+        while stack:
+            frame = stack[-1]
+            try:
+                if error is not _NOTHING:
+                    exc_info, error = error, _NOTHING
+                    part = frame.throw(*exc_info)
+                elif result is not _NOTHING:
+                    value, result = result, _NOTHING
+                    part = frame.send(value)
+                else:
+                    part = next(frame)
+            except StopIteration:
+                stack.pop()
+                continue
+            if isinstance(part, Pending):
+                future = part.future
+                if not future.done():
+                    if chunk:
+                        yield u''.join(chunk)
+                        chunk = []
+                        size = 0
+                    yield future
+                try:
+                    result = future.result()
+                except Exception:
+                    error = sys.exc_info()
+                continue
+            if isinstance(part, ComponentHtml):
+                if part.cache_key is not None:
+                    part = part.cached_fragment()[0]
+                elif isinstance(part._html, KeptHtml):
+                    stack.append(iter(part._html))
+                    continue
+                elif part._html is not None:
+                    part = part._html
+                else:
+                    stack.append(iter(part.html_parts()))
+                    continue
+            part = unicode(part)
+            chunk.append(part)
+            size += len(part)
+            if size >= chunk_size:
+                yield u''.join(chunk)
+                chunk = []
+                size = 0
+        if chunk:
+            yield u''.join(chunk)
+
+    def write_to(self, stream, encoding='utf-8', chunk_size=DEFAULT_CHUNK_SIZE):
+        """
+        Writes the HTML into the file-like @stream in chunks of @chunk_size bytes (characters if @encoding is None),
+        flushing the stream after every chunk, so the client receives the page while it is rendered.
+        """
+        flush = getattr(stream, 'flush', None)
+        for data in self.iter_chunks(chunk_size=chunk_size, encoding=encoding):
+            stream.write(data)
+            if flush is not None:
+                flush()
+
+    def html_parts(self):
+        """
+        Sequence of strings and child components that compose this tag, in document order.
+        Child components are expanded by render.
+        """
+        parts = [ComponentHtml.start_tag(self.tag_name, ComponentHtml.ordered_attributes(self.kwargs))]
+        parts.extend(self._children)
+        parts.append(ComponentHtml.end_tag(self.tag_name))
+        return parts
 
     def add_component(self, component):
         """
         @component must be a ComponentHtml or a unicode string.
         """
-        self.innerHtml += unicode(component)
-        self.propagate_scripts(component)
+        if self._children:
+            self._writable('_children').append(component)
+        else:
+            self._will_change()
+            self._children = [component]
+        if isinstance(component, ComponentHtml):
+            component.add_parent(self)
+        self.changed()
+
+    def add_parent(self, component):
+        parents = self._parents
+        if not parents:
+            self._parents = [weakref.ref(component)]
+            return
+        if len(parents) > 1:
+            parents[:] = [parent for parent in parents if parent() is not None]
+        parents.append(weakref.ref(component))
+
+    def has_parent(self, component):
+        for parent in self._parents:
+            if parent() is component:
+                return True
+        return False
+
+    def changed(self):
+        """
+        Drops the HTML kept for the component and its ancestors, so they are rendered again.
+        """
+        self._html = None
+        stack = [self]
+        while stack:
+            component = stack.pop()
+            for parent in component._parents:
+                parent = parent()
+                # Ancestors of a component without HTML do not have HTML either.
+                if parent is not None and parent._html is not None:
+                    parent._html = None
+                    stack.append(parent)
+
+    def child_components(self):
+        """
+        Child components of the tree, in document order.
+        """
+        return [child for child in self._children if isinstance(child, ComponentHtml)]
+
+    def collect_assets(self, registry=None):
+        """
+        AssetRegistry with the assets of the whole component tree.
+        """
+        if registry is None:
+            registry = AssetRegistry()
+        if self.cache_key is not None:
+            registry.merge(self.cached_fragment()[1])
+            return registry
+        return self._collect_assets(registry)
+
+    def _collect_assets(self, registry):
+        registry.add_component_assets(self)
+        stack = self.child_components()
+        stack.reverse()
+        while stack:
+            component = stack.pop()
+            if component.cache_key is not None:
+                registry.merge(component.cached_fragment()[1])
+                continue
+            registry.add_component_assets(component)
+            children = component.child_components()
+            if children:
+                children.reverse()
+                stack.extend(children)
+        return registry
 
     def propagate_scripts(self, component):
+        """
+        Copies the assets of the @component tree into this component.
+        Only needed for components that are not part of the rendered tree.
+        """
         if isinstance(component, ComponentHtml):
-            # avoid replicated libraries ('set' function does not preserve order)
-            for css_lib in component.css_libraries:
-                self.css_libraries.append(css_lib)
-            for js_lib in component.javascript_libraries:
-                self.javascript_libraries.append(js_lib)
-            self.add_javascript_code(component._script)
-            self.add_jquery_init_code(component.jquery_init_code)
+            registry = component.collect_assets()
+            for css_lib in registry.css_libraries:
+                self.add_css_library(css_lib)
+            for js_lib in registry.javascript_libraries:
+                self.add_javascript_library(js_lib)
+            self.add_javascript_code(registry.javascript_code)
+            self.add_jquery_init_code(registry.jquery_init_code)
 
     def get(self, attr):
         try:
@@ -49,59 +843,236 @@ class ComponentHtml(object):
             return None
 
     def set(self, attr, value):
-        self.kwargs[attr] = value
+        self._will_change()
+        if self.kwargs is EMPTY_ATTRIBUTES:
+            self.kwargs = {}
+        self._writable('kwargs')[attr] = value
+        self.changed()
 
     def clone(self):
-        return copy(self)
+        """
+        Copy of the component tree in time proportional to the number of child components: the attributes,
+        nodes and assets are shared until the component or the clone changes them. The child components
+        are cloned when they are reached through the clone (children, or attributes like Page.body),
+        or before they change in the cloned tree, so only the changed paths are copied.
+        """
+        cls = type(self)
+        component = cls.__new__(cls)
+        for name in self._state_slots():
+            if hasattr(self, name):
+                setattr(component, name, getattr(self, name))
+        if hasattr(self, '__dict__'):
+            component.__dict__.update(self.__dict__)
+        component._html = self._html
+        component._parents = ()
+        component._clones = ()
+        shared = tuple(name for name in self.shared_slots
+                       if not isinstance(getattr(self, name, None), (type(None), tuple, EmptyAttributes)))
+        self._copy_on_write = tuple(set(self._copy_on_write + shared))
+        component._copy_on_write = shared + (CHILD_COMPONENTS,)
+        clones = self._clones
+        if len(clones) > 1:
+            clones[:] = [clone for clone in clones if clone() is not None]
+        if clones:
+            clones.append(weakref.ref(component))
+        else:
+            self._clones = [weakref.ref(component)]
+        ComponentHtml._clones_made += 1
+        component._clone_epoch = ComponentHtml._clones_made
+        component._cloned()
+        return component
+
+    def _cloned(self):
+        """
+        Called in a new clone. Subclasses with attributes that reference descendants must own them here,
+        e.g. with _own_child.
+        """
+        pass
 
     # Scripts Methods
 
+    def _own_assets(self):
+        self._will_change()
+        if self._assets is None:
+            self._assets = AssetRegistry()
+        return self._writable('_assets')
+
+    @property
+    def css_libraries(self):
+        return self._assets.css_libraries if self._assets is not None else ()
+
+    @property
+    def javascript_libraries(self):
+        return self._assets.javascript_libraries if self._assets is not None else ()
+
+    @property
+    def _script(self):
+        return self._assets.javascript_code if self._assets is not None else u''
+
+    @property
+    def jquery_init_code(self):
+        return self._assets.jquery_init_code if self._assets is not None else u''
+
     def add_css_library(self, href):
-        self.css_libraries.append(href)
+        self._own_assets().add_css_library(href)
+        self.changed()
 
     def add_javascript_library(self, src):
-        self.javascript_libraries.append(src)
+        self._own_assets().add_javascript_library(src)
+        self.changed()
 
     def add_javascript_code(self, src):
-        self._script += src
+        self._own_assets().add_javascript_code(src)
+        self.changed()
 
     def add_jquery_init_code(self, src):
-        self.jquery_init_code += src
+        self._own_assets().add_jquery_init_code(src)
+        self.changed()
 
     # Global methods
 
     @classmethod
     def attribute_conversion(cls, name):
-        if name == 'clazz': return u'class'
-        if name == 'xml_lang': return u'xml:lang'
-        if name == 'http_equiv': return u'http-equiv'
-        return name
+        return cls.ATTRIBUTE_NAMES.get(name, name)
+
+    @classmethod
+    def register_attribute_name(cls, name, html_name):
+        """
+        Keyword @name will be rendered as the @html_name attribute.
+        """
+        ComponentHtml.ATTRIBUTE_NAMES[name] = html_name
+        ComponentHtml._attribute_prefixes.clear()
+
+    @classmethod
+    def ordered_attributes(cls, attributes):
+        """
+        @attributes as the dict that tag(**@attributes) receives. Python 2 dicts iterate in an order
+        that depends on their history, e.g. on set() calls, so the attributes of the components (simple or not)
+        are rendered from this new dict, in the same order as when components were rendered with tag(**self.kwargs)
+        and simple_tag(**self.kwargs). Rendering code must not iterate self.kwargs directly.
+        """
+        return _keyword_arguments(**attributes) if attributes else attributes
+
+    @classmethod
+    def attributes_string(cls, attributes):
+        "Values are escaped, except Markup values."
+        if not attributes:
+            return u''
+        prefixes = ComponentHtml._attribute_prefixes
+        strings = []
+        for key, value in attributes.iteritems():
+            if value:
+                try:
+                    prefix = prefixes[key]
+                except KeyError:
+                    prefix = prefixes[key] = u' %s="' % cls.attribute_conversion(key)
+                value_type = type(value)
+                if value_type is not Markup and (value_type is not unicode or needs_escaping(value) is not None):
+                    value = escape(value)
+                strings.append(u'%s%s"' % (prefix, value))
+        return u''.join(strings)
+
+    @classmethod
+    def start_tag(cls, tag_name, attributes):
+        if not attributes:
+            try:
+                return ComponentHtml._start_tags[tag_name]
+            except KeyError:
+                tag = ComponentHtml._start_tags[tag_name] = u'<%s>' % tag_name
+                ComponentHtml.register_static_fragments(tag)
+                return tag
+        return u'<%s%s>' % (tag_name, cls.attributes_string(attributes))
+
+    @classmethod
+    def end_tag(cls, tag_name):
+        try:
+            return ComponentHtml._end_tags[tag_name]
+        except KeyError:
+            tag = ComponentHtml._end_tags[tag_name] = u'</%s>' % tag_name
+            ComponentHtml.register_static_fragments(tag)
+            return tag
 
     @classmethod
     def tag(cls, tag_name, innerHtml, **kwargs):
-        attr_function = lambda key, value: u' %s="%s"' % (cls.attribute_conversion(key), value) if value else u''
-        attributes_string = u''.join(attr_function(key, value) for key, value in kwargs.iteritems()) if kwargs else u''
-        return u'<%s%s>%s</%s>' % (tag_name, attributes_string, innerHtml, tag_name)
+        return u'<%s%s>%s</%s>' % (tag_name, cls.attributes_string(kwargs), innerHtml, tag_name)
 
     @classmethod
     def simple_tag(cls, tag_name, **kwargs):
-        attr_function = lambda key, value: u' %s="%s"' % (cls.attribute_conversion(key), value) if value else u''
-        attributes_string = u''.join(attr_function(key, value) for key, value in kwargs.iteritems()) if kwargs else u''
-        return u'<%s%s/>' % (tag_name, attributes_string)
+        return u'<%s%s/>' % (tag_name, cls.attributes_string(kwargs))
+
+
+def _keyword_arguments(**kwargs):
+    return kwargs
+
+
+class Pending(object):
+    """
+    Part yielded by the html_parts generators of components that wait for a @future.
+    async_iter_html sends the result of the future into the generator, or throws its exception.
+    """
+    __slots__ = ('future',)
+
+    def __init__(self, future):
+        self.future = future
+
+    def __unicode__(self):
+        raise TypeError('Component tree waits for data: render it with async_iter_html')
+
+
+class AsyncContent(ComponentHtml):
+    """
+    Content (a component or a HTML string) that is the result of a @future. Rendered only by async_iter_html.
+    """
+    __slots__ = ('future',)
+
+    cacheable = False
+
+    def __init__(self, future):
+        super(AsyncContent, self).__init__(None)
+        self.future = future
+
+    #override
+    def html_parts(self):
+        content = yield Pending(self.future)
+        yield content
+
+
+def render_html(component):
+    "as_html as a function, so it can be sent to other processes."
+    return component.as_html()
+
+
+def changing_attribute(name):
+    """
+    Property that calls changed() when the instance attribute @name is assigned.
+    """
+    private_name = '_' + name
+    def getter(self):
+        return getattr(self, private_name)
+    def setter(self, value):
+        self._will_change()
+        setattr(self, private_name, value)
+        self.changed()
+    return property(getter, setter)
 
 
 class SimpleComponentHtml(ComponentHtml):
     """
     <TAG/>
     """
-    def as_html(self):
-        return ComponentHtml.simple_tag(self.tag_name, **self.kwargs)
+    __slots__ = ()
+
+    def html_parts(self):
+        attributes = ComponentHtml.ordered_attributes(self.kwargs)
+        return [u'<%s%s/>' % (self.tag_name, ComponentHtml.attributes_string(attributes))]
 
 
 class Image(SimpleComponentHtml):
     """
     <img>
     """
+    __slots__ = ()
+
     def __init__(self, src, **kwargs):
         super(Image, self).__init__(u'img', src=src, **kwargs)
 
@@ -110,6 +1081,8 @@ class Link(ComponentHtml):
     """
     <a>
     """
+    __slots__ = ()
+
     def __init__(self, href, innerHtml, target=None, **kwargs):
         super(Link, self).__init__(u'a', href=href, innerHtml=innerHtml, target=target, **kwargs)
 
@@ -118,6 +1091,8 @@ class Paragraph(ComponentHtml):
     """
     <p>
     """
+    __slots__ = ()
+
     def __init__(self, innerHtml, **kwargs):
         super(Paragraph, self).__init__(u'p', innerHtml=innerHtml, **kwargs)
 
@@ -126,50 +1101,72 @@ class UnorderedList(ComponentHtml):
     """
     <ul>
     """
+    __slots__ = ()
+
     def __init__(self, **kwargs):
         super(UnorderedList, self).__init__(u'ul', **kwargs)
 
     #override
     def add_component(self, component):
         if isinstance(component, (str, unicode)):
-            super(UnorderedList, self).add_component(ComponentHtml.tag(u'li', component))
+            super(UnorderedList, self).add_component(ComponentHtml(u'li', component))
         else:
             if component.tag_name == 'li':
                 super(UnorderedList, self).add_component(component)
             else:
-                super(UnorderedList, self).add_component(ComponentHtml.tag(u'li', component))
+                super(UnorderedList, self).add_component(ComponentHtml(u'li', component))
 
 
 class OrderedList(ComponentHtml):
     """
     <ol>
     """
+    __slots__ = ()
+
     def __init__(self, **kwargs):
         super(OrderedList, self).__init__(u'ol', **kwargs)
 
     #override
     def add_component(self, component):
         if isinstance(component, (str, unicode)):
-            super(OrderedList, self).add_component(ComponentHtml.tag(u'li', component))
+            super(OrderedList, self).add_component(ComponentHtml(u'li', component))
         else:
             if component.tag_name == 'li':
-                super(UnorderedList, self).add_component(component)
+                super(OrderedList, self).add_component(component)
             else:
-                super(UnorderedList, self).add_component(ComponentHtml.tag(u'li', component))
+                super(OrderedList, self).add_component(ComponentHtml(u'li', component))
 
 
 class Chunk(ComponentHtml):
     """
     <span>
     """
+    __slots__ = ()
+
     def __init__(self, innerHtml=u'', **kwargs):
         super(Chunk, self).__init__(u'span', innerHtml=innerHtml, **kwargs)
 
 
+class Fragment(ComponentHtml):
+    """
+    Nodes without an enclosing tag.
+    """
+    __slots__ = ()
+
+    def __init__(self, innerHtml=u''):
+        super(Fragment, self).__init__(None, innerHtml=innerHtml)
+
+    #override
+    def html_parts(self):
+        return list(self._children)
+
+
 class Panel(ComponentHtml):
     """
     <div>
     """
+    __slots__ = ()
+
     def __init__(self, innerHtml=u'', **kwargs):
         super(Panel, self).__init__(u'div', innerHtml=innerHtml, **kwargs)
 
@@ -178,6 +1175,8 @@ class InformationPanel(Panel):
     """
     <div><span class="label"><span><span class="value"><span></div>
     """
+    __slots__ = ('label_class', 'value_class')
+
     def __init__(self, innerHtml=u'', label_class='', value_class='value', **kwargs):
         super(Panel, self).__init__(u'div', innerHtml=innerHtml, **kwargs)
         self.label_class = label_class
@@ -193,66 +1192,383 @@ class Table(ComponentHtml):
     """
     <table>
     """
+    __slots__ = ('_header', '_header_line', '_body', '_body_line', '_rows', '_line_index')
+
     LINE_CLASSES = (u'odd', u'even')
 
     def __init__(self, **kwargs):
         super(Table, self).__init__(u'table', **kwargs)
         self._header = ComponentHtml(u'thead', u'')
         self._header_line = None
-        self._body = ComponentHtml(u'tbody', u'')
+        self._body = TableBody()
         self._body_line = None
+        # TableRows of the last lines added by add_row or add_rows
+        self._rows = None
         self._line_index = 0
+        self.add_component(self._header)
+        self.add_component(self._body)
 
-    def start_header_line(self):
+    #override
+    def _cloned(self):
+        self._header = self._own_child(self._header)
+        self._body = self._own_child(self._body)
         if self._header_line is not None:
-            self._header.add_component(self._header_line)
+            self._header_line = self._header._own_child(self._header_line)
+        if self._body_line is not None:
+            self._body_line = self._body._own_child(self._body_line)
+        if self._rows is not None:
+            self._rows = self._body._own_child(self._rows)
+
+    def start_header_line(self):
+        self._will_change()
         self._header_line = ComponentHtml(u'tr', u'')
+        self._header.add_component(self._header_line)
 
     def add_cell_on_header(self, content, **kwargs):
-        # FIXME: it must propagate libraries
-        self.propagate_scripts(content)
+        "Strings are escaped, unless they are Markup."
         if self._header_line is None:
             self.start_header_line()
         if isinstance(content, (str, unicode)):
-            content = ComponentHtml(u'th', content, **kwargs)
+            content = ComponentHtml(u'th', escape(content), **kwargs)
         self._header_line.add_component(content)
 
     def start_line(self):
-        if self._body_line is not None:
-            self._body.add_component(self._body_line)
+        self._will_change()
         self._body_line = ComponentHtml(u'tr', '', clazz=Table.LINE_CLASSES[self._line_index % 2])
+        self._body.add_component(self._body_line)
+        self._rows = None
         self._line_index += 1
 
     def add_cell(self, content, **kwargs):
-        # FIXME: it must propagate libraries
-        self.propagate_scripts(content)
+        "@content is a component or a text, that is escaped unless it is Markup."
         if self._body_line is None:
             self.start_line()
+        if not isinstance(content, ComponentHtml):
+            content = escape(content)
         content = ComponentHtml(u'td', content, **kwargs)
         self._body_line.add_component(content)
 
+    def stream_rows(self, rows):
+        """
+        Appends to the body the lines of @rows (an iterable of iterables of cells, e.g. a generator or a DB cursor).
+        Rows are pulled only while the table is rendered and they are never stored, so an iterator can be rendered once.
+        Lines are striped while the body is rendered, so the lines added after the streamed rows continue their striping.
+        Libraries and scripts of streamed components are not collected.
+        Cells that are not components are escaped, unless they are Markup.
+        """
+        self._will_change()
+        self._body.add_component(TableRowStream(rows, self._line_index))
+        self._body_line = None
+        self._rows = None
+
+    def stream_rows_async(self, rows):
+        """
+        Appends to the body the lines of @rows, an asynchronous iterator: its __anext__ returns a future of the next row,
+        that raises StopAsyncIteration after the last one. See stream_rows (and its striping).
+        Rendered only by async_iter_html.
+        """
+        self._will_change()
+        self._body.add_component(AsyncTableRowStream(rows, self._line_index))
+        self._body_line = None
+        self._rows = None
+
+    def add_row(self, values, cell_attrs=None, formatters=None):
+        """
+        Appends a line with the cells of @values. See add_rows.
+        """
+        self.add_rows([values], cell_attrs=cell_attrs, formatters=formatters)
+
+    def add_rows(self, rows, cell_attrs=None, formatters=None):
+        """
+        Appends the lines of @rows (an iterable of sequences of cells). Cells are rendered straight from the values,
+        without a component per cell or per line. Cells that are components are children of the lines, so their changes
+        are rendered and their libraries and scripts are collected.
+        @cell_attrs: attributes of the <td> of every cell (a dict) or of each column (a sequence of dicts or None).
+        @formatters: sequence with a function (or None) per column that converts the value of the cell before it is escaped.
+        """
+        self._will_change()
+        rows = list(rows)
+        block = self._rows
+        if block is None or block.cell_attrs != cell_attrs or block.formatters != formatters:
+            block = self._rows = TableRows([], self._line_index, cell_attrs=cell_attrs, formatters=formatters)
+            self._body.add_component(block)
+        block.add_rows(rows)
+        self._body_line = None
+        self._line_index += len(rows)
+
+    @classmethod
+    def from_rows(cls, rows, columns=None, **kwargs):
+        """
+        Table with a header line with @columns and a body that streams @rows.
+        """
+        table = cls(**kwargs)
+        for column in columns or ():
+            table.add_cell_on_header(column)
+        table.stream_rows(rows)
+        return table
+
+    @classmethod
+    def from_columns(cls, columns, formatters=None, **kwargs):
+        """
+        Table with a header line with the names of @columns and a line per position of the columns.
+        @columns: mapping or sequence of (name, sequence of values) pairs. Use an OrderedDict or pairs to keep the order.
+        @formatters: dict with the function that converts the values of the column of each name.
+        """
+        if hasattr(columns, 'items'):
+            columns = columns.items()
+        table = cls(**kwargs)
+        for name, _ in columns:
+            table.add_cell_on_header(name)
+        if formatters:
+            formatters = [formatters.get(name) for name, _ in columns]
+        table.add_rows(zip(*[values for _, values in columns]), formatters=formatters)
+        return table
+
+
+class TableBody(ComponentHtml):
+    """
+    <tbody> of a Table, that stripes its lines while it is rendered.
+    """
+    __slots__ = ()
+
+    def __init__(self, **kwargs):
+        super(TableBody, self).__init__(u'tbody', **kwargs)
+
     #override
-    def as_html(self):
-        self.start_header_line()
-        self.start_line()
-        self.innerHtml = self._header.as_html()
-        self.innerHtml += self._body.as_html()
-        return super(Table, self).as_html()
+    def html_parts(self):
+        """
+        The lines keep the classes of the index they were added with, unless the rows streamed before them
+        change its parity: then their start tags are rendered with the class of the rendered index.
+        """
+        yield ComponentHtml.start_tag(self.tag_name, ComponentHtml.ordered_attributes(self.kwargs))
+        # Index of the next line, shared with the streams that count their lines while they are rendered.
+        lines = [0]
+        for child in self._children:
+            if isinstance(child, TableRows):
+                if child.first_line_index % 2 == lines[0] % 2:
+                    yield child
+                else:
+                    for part in child.rows_parts([lines[0]]):
+                        yield part
+                lines[0] += len(child.rows)
+            elif isinstance(child, TableRowStream):
+                child.line_counter = lines
+                yield child
+            elif isinstance(child, ComponentHtml) and child.tag_name == u'tr':
+                line_class = Table.LINE_CLASSES[lines[0] % 2]
+                if child.get('clazz') in Table.LINE_CLASSES and child.get('clazz') != line_class:
+                    attributes = dict(child.kwargs, clazz=line_class)
+                    yield ComponentHtml.start_tag(u'tr', ComponentHtml.ordered_attributes(attributes))
+                    for node in child._children:
+                        yield node
+                    yield ComponentHtml.end_tag(u'tr')
+                else:
+                    yield child
+                lines[0] += 1
+            else:
+                yield child
+        yield ComponentHtml.end_tag(self.tag_name)
+
+
+class TableRowStream(ComponentHtml):
+    """
+    <tr><td></td></tr>... pulled from an iterable of rows while rendering.
+    """
+    __slots__ = ('rows', 'first_line_index', 'cell_attrs', 'formatters', 'line_counter')
+
+    cacheable = False
+
+    def __init__(self, rows, first_line_index=0, cell_attrs=None, formatters=None):
+        """
+        @cell_attrs and @formatters: see Table.add_rows.
+        """
+        super(TableRowStream, self).__init__(None)
+        self.rows = rows
+        self.first_line_index = first_line_index
+        self.cell_attrs = cell_attrs
+        self.formatters = formatters
+        # [index of the next line], shared with the TableBody that renders the stream.
+        self.line_counter = None
+
+    def _cell_tags(self):
+        "<td> of every cell (unicode) or of each column (list)."
+        cell_attrs = self.cell_attrs
+        if cell_attrs is None:
+            return u'<td>'
+        if isinstance(cell_attrs, dict):
+            return ComponentHtml.start_tag(u'td', cell_attrs)
+        return [ComponentHtml.start_tag(u'td', attrs or EMPTY_ATTRIBUTES) for attrs in cell_attrs]
+
+    def _lines(self):
+        "[index of the next line], incremented by each rendered line."
+        if self.line_counter is not None:
+            return self.line_counter
+        return [self.first_line_index]
+
+    def _row_renderer(self, lines):
+        """
+        Function that returns the parts of the next line with the cells of a row.
+        @lines: [index of the next line], incremented by each line.
+        """
+        line_tags = [ComponentHtml.start_tag(u'tr', dict(clazz=line_class)) for line_class in Table.LINE_CLASSES]
+        cell_tag = self._cell_tags()
+        column_tags = None
+        if not isinstance(cell_tag, unicode):
+            column_tags, cell_tag = cell_tag, u'<td>'
+        separator = u'</td>' + cell_tag
+        formatters = self.formatters
+
+        def row_parts(row):
+            parts = [line_tags[lines[0] % 2]]
+            lines[0] += 1
+            row = list(row)
+            if formatters:
+                for column, format in enumerate(formatters[:len(row)]):
+                    if format is not None:
+                        row[column] = format(row[column])
+            components = [cell for cell in row if isinstance(cell, ComponentHtml)]
+            if not components and column_tags is None:
+                if row:
+                    parts.append(u'%s%s</td>' % (cell_tag, separator.join(escape_many(row))))
+            else:
+                texts = iter(escape_many([cell for cell in row if not isinstance(cell, ComponentHtml)]))
+                for column, cell in enumerate(row):
+                    tag = column_tags[column] if column_tags is not None and column < len(column_tags) else cell_tag
+                    if isinstance(cell, ComponentHtml):
+                        parts.extend((tag, cell, u'</td>'))
+                    else:
+                        parts.append(u'%s%s</td>' % (tag, next(texts)))
+            parts.append(u'</tr>')
+            return parts
+        return row_parts
+
+    def rows_parts(self, lines):
+        "Parts of the lines of the rows, striped from @lines (see _row_renderer)."
+        row_parts = self._row_renderer(lines)
+        for row in self.rows:
+            for part in row_parts(row):
+                yield part
+
+    #override
+    def html_parts(self):
+        return self.rows_parts(self._lines())
+
+
+class AsyncTableRowStream(TableRowStream):
+    """
+    <tr><td></td></tr>... of the rows of an asynchronous iterator. Rendered only by async_iter_html.
+    """
+    __slots__ = ()
+
+    #override
+    def html_parts(self):
+        row_parts = self._row_renderer(self._lines())
+        while True:
+            try:
+                row = yield Pending(self.rows.__anext__())
+            except StopAsyncIteration:
+                return
+            for part in row_parts(row):
+                yield part
+
+
+class TableRows(TableRowStream):
+    """
+    <tr><td></td></tr>... of lines that are kept, so the table can be rendered many times.
+    """
+    __slots__ = ()
+
+    cacheable = True
+    shared_slots = TableRowStream.shared_slots + ('rows',)
+
+    def add_rows(self, rows):
+        """
+        The cells of @rows that are components are added as children, so their changes and assets
+        reach the table, but they are rendered from the rows.
+        """
+        self._writable('rows').extend(rows)
+        for cell in [cell for row in rows for cell in row if isinstance(cell, ComponentHtml)]:
+            self.add_component(cell)
+        self.changed()
+
+    #override
+    def _children_cloned(self, clones):
+        self.rows = [[clones.get(id(cell), cell) for cell in row] for row in self.rows]
+        self._copy_on_write = tuple(name for name in self._copy_on_write if name != 'rows')
 
 
 class Form(ComponentHtml):
     """
     <form>
     """
+    __slots__ = ('_fields',)
+
     def __init__(self, action, method=u'post', **kwargs):
         super(Form, self).__init__(u'form', action=action, method=method, **kwargs)
+        # name -> field of the tree (see FIELD_READERS), built when it is first used.
+        self._fields = None
+
+    #override
+    def add_component(self, component):
+        super(Form, self).add_component(component)
+        if self._fields is not None and isinstance(component, ComponentHtml):
+            self._index_fields(component)
 
     def add_component_with_label(self, label, component):
         panel = ComponentHtml(u'div', '', clazz=u'form-label-field')
-        panel.add_component(ComponentHtml.tag(u'div', ComponentHtml.tag(u'span', label), clazz=u'form-label'))
-        panel.add_component(ComponentHtml.tag(u'div', component, clazz=u'form-field'))
+        panel.add_component(ComponentHtml(u'div', ComponentHtml(u'span', label), clazz=u'form-label'))
+        panel.add_component(ComponentHtml(u'div', component, clazz=u'form-field'))
         self.add_component(panel)
 
+    #override
+    def _cloned(self):
+        # The fields of the clone are reached through its children, so they are cloned too.
+        self._fields = None
+
+    def _index_fields(self, component):
+        fields = self._fields
+        stack = [component]
+        while stack:
+            component = stack.pop()
+            if _field_function(FIELD_READERS, type(component)) is not None:
+                name = component.get(u'name') or component.get(u'id')
+                if name is not None:
+                    fields[name] = component
+                continue
+            stack.extend(child for child in reversed(component.children) if isinstance(child, ComponentHtml))
+
+    def fields(self):
+        """
+        Dict name -> field (TextBox, TextArea, CheckBox, Select, UploadBox or HiddenField) of the whole form.
+        Fields are indexed when they are added to the form, or when they are added to a component
+        before the form is first bound. Call reindex after adding fields to components of a bound form.
+        """
+        if self._fields is None:
+            self.reindex()
+        return self._fields
+
+    def reindex(self):
+        self._fields = {}
+        for child in self.children:
+            if isinstance(child, ComponentHtml):
+                self._index_fields(child)
+
+    def bind(self, data):
+        """
+        Sets the values of the fields with the names in the dict @data, e.g. the submitted values
+        or the ones of a model. Values are converted by the functions of FIELD_WRITERS.
+        """
+        fields = self.fields()
+        for name, value in data.iteritems():
+            field = fields.get(name)
+            if field is not None:
+                _field_function(FIELD_WRITERS, type(field))(field, value)
+
+    def values(self):
+        "Dict name -> value of every field, converted by the functions of FIELD_READERS."
+        return dict((name, _field_function(FIELD_READERS, type(field))(field))
+                    for name, field in self.fields().iteritems())
+
     def include_file_upload(self):
         self.set('enctype', 'multipart/form-data')
 
@@ -261,6 +1577,8 @@ class TextBox(SimpleComponentHtml):
     """
     <input type="text">
     """
+    __slots__ = ()
+
     def __init__(self, name, value, maxlength=100, **kwargs):
         super(TextBox, self).__init__(u'input', type=u'text', name=name, value=value, maxlength=maxlength, **kwargs)
 
@@ -269,6 +1587,8 @@ class TextArea(ComponentHtml):
     """
     <textarea>
     """
+    __slots__ = ()
+
     def __init__(self, name, value, maxlength=500, **kwargs):
         super(TextArea, self).__init__(u'textarea', name=name, value=value, maxlength=maxlength, **kwargs)
 
@@ -277,6 +1597,8 @@ class CheckBox(SimpleComponentHtml):
     """
     <input type="checkbox">
     """
+    __slots__ = ()
+
     def __init__(self, name, **kwargs):
         super(CheckBox, self).__init__(u'input', type=u'checkbox', name=name, **kwargs)
 
@@ -303,6 +1625,8 @@ class UploadBox(SimpleComponentHtml):
     """
     <input type="file">
     """
+    __slots__ = ()
+
     def __init__(self, name, value, **kwargs):
         super(UploadBox, self).__init__(u'input', type=u'file', name=name, value=value, **kwargs)
 
@@ -311,6 +1635,11 @@ class Select(ComponentHtml):
     """
     <select>
     """
+    __slots__ = ('options', '_option_indexes', '_selected')
+
+    shared_slots = ComponentHtml.shared_slots + ('options', '_option_indexes', '_selected')
+    derived_slots = ('options', '_option_indexes', '_selected')
+
     def __init__(self, name, multiple=False, **kwargs):
         if multiple:
             multiple = u'multiple'
@@ -318,56 +1647,146 @@ class Select(ComponentHtml):
             multiple = u''
         super(Select, self).__init__(u'select', name=name, multiple=multiple, **kwargs)
         self.options = []
+        # unicode(value) -> tuple with the positions of the options with that value
+        self._option_indexes = {}
+        # positions of the selected options
+        self._selected = set()
 
     def add_option(self, label, value, selected=False):
+        "@label is a component or a text, that is escaped unless it is Markup."
+        if not isinstance(label, ComponentHtml):
+            label = escape(label)
+        self._add_option(label, value, selected)
+
+    def add_options(self, options):
+        """
+        Adds the (label, value) pairs of @options, escaping the labels of all options at once.
+        """
+        options = list(options)
+        texts = iter(escape_many([label for label, _ in options if not isinstance(label, ComponentHtml)]))
+        for label, value in options:
+            if not isinstance(label, ComponentHtml):
+                label = next(texts)
+            self._add_option(label, value)
+
+    def add_options_async(self, options, selected=()):
+        """
+        Appends the (label, value) pairs of @options, an asynchronous iterator (see Table.stream_rows_async).
+        The options with the values in @selected are selected. They are rendered only by async_iter_html
+        and they are not returned by get('value').
+        """
+        self.add_component(AsyncOptionStream(options, selected))
+
+    def _add_option(self, label, value, selected=False):
         if selected:
             option = ComponentHtml(u'option', innerHtml=label, value=value, selected=u'selected')
         else:
             option = ComponentHtml(u'option', innerHtml=label, value=value)
-        self.options.append(option)
+        self._index_option(option)
+        self.add_component(option)
+
+    def _index_option(self, option):
+        index = len(self.options)
+        if option.get(u'selected'):
+            self._writable('_selected').add(index)
+        option_indexes = self._writable('_option_indexes')
+        key = unicode(option.get(u'value'))
+        # Tuples, because the lists of a copied dict would still be shared with the clones.
+        option_indexes[key] = option_indexes.get(key, ()) + (index,)
+        self._writable('options').append(option)
+
+    #override
+    def _rebuild_derived_slots(self):
+        options = self.options = [child for child in self._children
+                                  if isinstance(child, ComponentHtml) and child.tag_name == u'option']
+        option_indexes = self._option_indexes = {}
+        selected = self._selected = set()
+        for index, option in enumerate(options):
+            attributes = option.kwargs
+            key = unicode(attributes.get(u'value'))
+            option_indexes[key] = option_indexes.get(key, ()) + (index,)
+            if attributes.get(u'selected'):
+                selected.add(index)
+
+    def _select_option(self, index):
+        option = self._own_child(self.options[index])
+        option.set(u'selected', u'selected')
+        self._writable('_selected').add(index)
+
+    def clear_selection(self):
+        "Unselects the selected options."
+        for index in sorted(self._selected):
+            self._own_child(self.options[index]).set(u'selected', u'')
+        self._will_change()
+        self._selected = set()
+        self._copy_on_write = tuple(name for name in self._copy_on_write if name != '_selected')
+
+    #override
+    def _children_cloned(self, clones):
+        self.options = [clones.get(id(option), option) for option in self.options]
+        self._copy_on_write = tuple(name for name in self._copy_on_write if name != 'options')
 
     def set(self, attr, value):
         "Select should have value attribute too. We need a trustable and solid standard"
         if attr == u'value':
             if isinstance(value, list):
                 for v in value:
-                    for option in self.options:
-                        if unicode(option.get(u'value')) == v:
-                            option.set(u'selected', u'selected')
-                            break
+                    indexes = self._option_indexes.get(v)
+                    if indexes:
+                        self._select_option(indexes[0])
             else: # only one value
-                for option in self.options:
-                    if option.get(u'value') == value:
-                        option.set(u'selected', u'selected')
+                for index in self._option_indexes.get(unicode(value), ()):
+                    if self.options[index].get(u'value') == value:
+                        self._select_option(index)
         else:
             super(Select, self).set(attr, value)
 
     def get(self, attr):
         if attr == u'value':
             if self.get(u'multiple') == u'multiple':
-                values = []
-                for option in self.options:
-                    if option.get(u'selected') == u'selected':
-                        values.append(option.get(u'value'))
-                return values
+                return [self.options[index].get(u'value') for index in sorted(self._selected)]
             else:
-                for option in self.options:
-                    if option.get(u'selected') == u'selected':
-                        return option.get(u'value')
+                if self._selected:
+                    return self.options[min(self._selected)].get(u'value')
                 return None
         else:
             return super(Select, self).get(attr)
 
+
+class AsyncOptionStream(ComponentHtml):
+    """
+    <option></option>... of the (label, value) pairs of an asynchronous iterator. Rendered only by async_iter_html.
+    """
+    __slots__ = ('options', 'selected')
+
+    cacheable = False
+
+    def __init__(self, options, selected=()):
+        super(AsyncOptionStream, self).__init__(None)
+        self.options = options
+        self.selected = set(unicode(value) for value in selected)
+
     #override
-    def as_html(self):
-        self.innerHtml = ''.join([option.as_html() for option in self.options])
-        return super(Select, self).as_html()
+    def html_parts(self):
+        while True:
+            try:
+                label, value = yield Pending(self.options.__anext__())
+            except StopAsyncIteration:
+                return
+            if unicode(value) in self.selected:
+                yield ComponentHtml.start_tag(u'option', dict(value=value, selected=u'selected'))
+            else:
+                yield ComponentHtml.start_tag(u'option', dict(value=value))
+            yield label if isinstance(label, ComponentHtml) else escape(label)
+            yield u'</option>'
 
 
 class SubmitButton(SimpleComponentHtml):
     """
     <input type="submit">
     """
+    __slots__ = ()
+
     def __init__(self, id, value, **kwargs):
         super(SubmitButton, self).__init__(u'input', type=u'submit', id=id, value=value, **kwargs)
 
@@ -376,6 +1795,8 @@ class HiddenField(SimpleComponentHtml):
     """
     <input type="submit">
     """
+    __slots__ = ()
+
     def __init__(self, id, value, **kwargs):
         super(HiddenField, self).__init__(u'input', type=u'hidden', id=id, value=value, **kwargs)
 
@@ -384,14 +1805,81 @@ class Button(ComponentHtml):
     """
     <button>
     """
+    __slots__ = ()
+
     def __init__(self, id, **kwargs):
         super(Button, self).__init__(u'button', id=id, **kwargs)
 
 
+def _read_value(field):
+    return field.kwargs.get(u'value')
+
+
+def _write_value(field, value):
+    field.set(u'value', value)
+
+
+def _read_checked(field):
+    return bool(field.kwargs.get(u'checked'))
+
+
+def _write_checked(field, value):
+    field.set(u'checked', u'checked' if value in (True, 'True', 'true', 'on') else u'')
+
+
+def _read_selected(field):
+    return field.get(u'value')
+
+
+def _write_selected(field, value):
+    field.clear_selection()
+    field.set(u'value', value)
+
+
+# Field class -> function that returns the value of the field, used by Form.values.
+FIELD_READERS = {
+    TextBox: _read_value,
+    TextArea: _read_value,
+    UploadBox: _read_value,
+    HiddenField: _read_value,
+    CheckBox: _read_checked,
+    Select: _read_selected,
+}
+# Field class -> function that sets the value of the field, used by Form.bind.
+FIELD_WRITERS = {
+    TextBox: _write_value,
+    TextArea: _write_value,
+    UploadBox: _write_value,
+    HiddenField: _write_value,
+    CheckBox: _write_checked,
+    Select: _write_selected,
+}
+
+
+def _field_function(functions, cls):
+    "Function of FIELD_READERS or FIELD_WRITERS (@functions) for the field class @cls or its closest base class."
+    for klass in cls.__mro__:
+        function = functions.get(klass)
+        if function is not None:
+            return function
+    return None
+
+
 class Head(ComponentHtml):
     """
     <head>
     """
+    __slots__ = ('_title', '_description', '_keywords', '_favicon')
+
+    title = changing_attribute('title')
+    description = changing_attribute('description')
+    keywords = changing_attribute('keywords')
+    favicon = changing_attribute('favicon')
+
+    CONTENT_TYPE = ComponentHtml.simple_tag(u'meta', http_equiv=u'Content-Type', content=u'text/html;charset=UTF-8')
+    # html_objects.bundles.ScriptBundler of the javascript code of the pages. Without it, the jQuery init code is inlined.
+    script_bundler = None
+
     def __init__(self, title, description, keywords, favicon, **kwargs):
         super(Head, self).__init__(u'head', **kwargs)
         self.title = title
@@ -400,28 +1888,51 @@ class Head(ComponentHtml):
         self.favicon = favicon
 
     #override
-    def as_html(self):
-        self.innerHtml = ComponentHtml.tag(u'title', self.title)
-        self.innerHtml += ComponentHtml.simple_tag(u'meta', name=u'description', content=self.description)
-        self.innerHtml += ComponentHtml.simple_tag(u'meta', name=u'keywords', content=self.keywords)
-        self.innerHtml += ComponentHtml.simple_tag(u'meta', http_equiv=u'Content-Type', content=u'text/html;charset=UTF-8')
+    def html_parts(self, assets=None):
+        """
+        @assets: AssetRegistry of the page. By default, the assets of the page of the head, if it has one,
+        or of the head tree.
+        """
+        if assets is None:
+            assets = self._page_assets()
+        parts = [ComponentHtml.start_tag(self.tag_name, ComponentHtml.ordered_attributes(self.kwargs))]
+        parts.append(ComponentHtml.tag(u'title', self.title))
+        parts.append(ComponentHtml.simple_tag(u'meta', name=u'description', content=self.description))
+        parts.append(ComponentHtml.simple_tag(u'meta', name=u'keywords', content=self.keywords))
+        parts.append(Head.CONTENT_TYPE)
         if self.favicon:
-            self.innerHtml += ComponentHtml.simple_tag(u'link', rel=u'shortcut', href=self.favicon)
-        for href in self.css_libraries:
-            self.innerHtml += ComponentHtml.simple_tag(u'link', type=u'text/css', rel=u'stylesheet', href=href)
-        for src in self.javascript_libraries:
-            self.innerHtml += ComponentHtml.tag(u'script', '', type=u'text/javascript', src=src)
-        script = ComponentHtml(u'script', '', type=u'text/javascript')
-        if self.jquery_init_code:
-            script.add_component(u'$(document).ready(function() { %s });' % self.jquery_init_code);
-        self.innerHtml += script.as_html()
-        return super(Head, self).as_html()
+            parts.append(ComponentHtml.simple_tag(u'link', rel=u'shortcut', href=self.favicon))
+        for href in assets.css_libraries:
+            parts.append(ComponentHtml.simple_tag(u'link', type=u'text/css', rel=u'stylesheet', href=href))
+        for src in assets.javascript_libraries:
+            parts.append(ComponentHtml.tag(u'script', '', type=u'text/javascript', src=src))
+        jquery_init_code = assets.jquery_init_code
+        if jquery_init_code:
+            jquery_init_code = u'$(document).ready(function() { %s });' % jquery_init_code
+        if Head.script_bundler is not None:
+            code = assets.javascript_code + jquery_init_code
+            if code:
+                parts.append(Head.script_bundler.script_tag(code))
+        else:
+            # A string, not a component: the head does not keep HTML that depends on the assets of the page.
+            parts.append(ComponentHtml.tag(u'script', jquery_init_code, type=u'text/javascript'))
+        parts.append(ComponentHtml.end_tag(self.tag_name))
+        return parts
+
+    def _page_assets(self):
+        for parent in self._parents:
+            parent = parent()
+            if isinstance(parent, Page) and parent.head is self:
+                return parent.collect_assets()
+        return self.collect_assets()
 
 
 class Body(ComponentHtml):
     """
     <body>
     """
+    __slots__ = ()
+
     def __init__(self, **kwargs):
         super(Body, self).__init__(u'body', **kwargs)
 
@@ -430,20 +1941,47 @@ class Page(ComponentHtml):
     """
     <html>
     """
+    __slots__ = ('_doc_type', 'head', 'body')
+
     TRANSITIONAL_401 = u'<!DOCTYPE HTML PUBLIC "-//W3C//DTD HTML 4.01 Transitional//EN" "http://www.w3.org/TR/html4/loose.dtd">\n'
     STRICT_401 = u'<!DOCTYPE HTML PUBLIC "-//W3C//DTD HTML 4.01//EN" "http://www.w3.org/TR/html4/strict.dtd">\n'
     HTML5_DOCTYPE = u'<!DOCTYPE html>\n'
 
+    doc_type = changing_attribute('doc_type')
+
     def __init__(self, title, description, keywords, favicon=None, doc_type=TRANSITIONAL_401, lang=u'en'):
         super(Page, self).__init__(u'html', xmlns=u'http://www.w3.org/1999/xhtml', xml_lang=lang, lang=lang)
         self.doc_type = doc_type
         self.head = Head(title, description, keywords, favicon)
+        self.head.add_parent(self)
         self.body = Body()
+        self.body.add_parent(self)
 
     #override
-    def as_html(self):
-        self.head.propagate_scripts(self)
-        self.head.propagate_scripts(self.body)
-        self.innerHtml = self.head.as_html()
-        self.innerHtml += self.body.as_html()
-        return self.doc_type + super(Page, self).as_html()
+    def child_components(self):
+        return [self.head, self.body]
+
+    #override
+    def _cloned(self):
+        self.head = self.head.clone()
+        self.head.add_parent(self)
+        self.body = self.body.clone()
+        self.body.add_parent(self)
+
+    #override
+    def html_parts(self):
+        # The head is rendered as a child component, with the assets of the page (see Head.html_parts).
+        parts = [self.doc_type, ComponentHtml.start_tag(self.tag_name, ComponentHtml.ordered_attributes(self.kwargs)),
+                 self.head, self.body]
+        parts.append(ComponentHtml.end_tag(self.tag_name))
+        return parts
+
+
+def _page_fragments():
+    "Fragments of every page, table and select, encoded once."
+    return [Page.TRANSITIONAL_401, Page.STRICT_401, Page.HTML5_DOCTYPE, Head.CONTENT_TYPE,
+            u'<td>', u'</td>', u'</tr>', u'</option>'] + \
+           [ComponentHtml.start_tag(u'tr', dict(clazz=line_class)) for line_class in Table.LINE_CLASSES]
+
+
+ComponentHtml._static_fragment_factories.append(_page_fragments)
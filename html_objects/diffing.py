@@ -0,0 +1,144 @@
+# coding: utf-8
+import weakref
+
+from html_objects.components import ComponentHtml
+
+
+# Applies the patches of LiveRenderer.diff in the browser, e.g. applyHtmlPatches(JSON.parse(response), 'data-node').
+CLIENT_SCRIPT = u'''function applyHtmlPatches(patches, attribute) {
+    for (var i = 0; i < patches.length; i++) {
+        var id = patches[i][0], html = patches[i][1];
+        if (id === null) {
+            document.open(); document.write(html); document.close();
+        } else {
+            var node = document.querySelector('[' + attribute + '="' + id + '"]');
+            if (node) node.outerHTML = html;
+        }
+    }
+}'''
+
+
+class LiveRenderer(object):
+    """
+    Renders a component tree once and then only the components that changed since the last render,
+    e.g. for dashboards that are updated by polling.
+    The tags of the components are rendered with a stable id in the @attribute, and diff returns
+    the (id, HTML) pairs of the changed components, applied by CLIENT_SCRIPT.
+    Unchanged subtrees are found with the HTML kept by the components (see ComponentHtml.render),
+    so a diff walks only the paths to the changed components.
+    """
+    def __init__(self, root, attribute=u'data-node'):
+        self.root = root
+        self.attribute = attribute
+        self._ids = weakref.WeakKeyDictionary()
+        self._last_id = 0
+        # component -> (kept HTML of the component, parts with the ids of the child components) when it was sent
+        self._sent = weakref.WeakKeyDictionary()
+
+    def node_id(self, component):
+        try:
+            return self._ids[component]
+        except KeyError:
+            self._last_id += 1
+            node_id = self._ids[component] = u'n%d' % self._last_id
+            return node_id
+
+    def render(self):
+        "HTML of the whole tree, with the ids."
+        self.root.as_html() # keeps the HTML of the subtrees, see diff
+        return self._render(self.root)
+
+    def diff(self):
+        """
+        List of (id, HTML) of the components that changed since the last render or diff, with the ids
+        of their descendants. The id is None when the whole tree must be replaced, e.g. for the <head> of a Page.
+        """
+        self.root.as_html()
+        patches = []
+        if not self._diff(self.root, patches):
+            return [(None, self._render(self.root))]
+        return patches
+
+    def _parts(self, component):
+        if component.cache_key is not None:
+            return [component.cached_fragment()[0]]
+        return list(component.html_parts())
+
+    def _shape(self, component, parts):
+        """
+        The @parts of the @component with the ids of its child components. Components created by
+        html_parts (e.g. the <title> of a Head) are not children, they are compared by their HTML.
+        """
+        shape = []
+        for part in parts:
+            if not isinstance(part, ComponentHtml):
+                shape.append(unicode(part))
+            elif part.has_parent(component):
+                shape.append(self.node_id(part))
+            else:
+                shape.append(part.as_html())
+        return tuple(shape)
+
+    def _has_id(self, component, parts):
+        """
+        True if the id can be added to the start tag of the @parts of the @component.
+        The <head> has no id: browsers cannot replace it, so the whole document is sent instead.
+        """
+        if not component.tag_name or component.tag_name == u'head' or not parts or not isinstance(parts[0], basestring):
+            return False
+        prefix = u'<' + component.tag_name
+        return parts[0].startswith(prefix) and parts[0][len(prefix):len(prefix) + 1] in (u' ', u'>', u'/')
+
+    def _diff(self, component, patches):
+        """
+        Appends the patches of the tree of @component to @patches.
+        False if the component changed and it has no id, so its parent must be sent instead.
+        """
+        sent = self._sent.get(component)
+        if sent is not None and component._html is not None and component._html is sent[0]:
+            return True
+        parts = self._parts(component)
+        shape = self._shape(component, parts)
+        if sent is None or shape != sent[1] or not component.cacheable:
+            if not self._has_id(component, parts):
+                return False
+            patches.append((self.node_id(component), self._render(component)))
+            return True
+        # Same tag and nodes: only the child components may have changed.
+        self._sent[component] = (component._html, shape)
+        start = len(patches)
+        for part in parts:
+            if isinstance(part, ComponentHtml) and part.has_parent(component) and not self._diff(part, patches):
+                del patches[start:]
+                if not self._has_id(component, parts):
+                    return False
+                patches.append((self.node_id(component), self._render(component)))
+                return True
+        return True
+
+    def _render(self, component):
+        "HTML of the tree of @component, with the ids, recording what was sent."
+        buffer = []
+        stack = [(iter(self._render_parts(component)), component)]
+        while stack:
+            parts, parent = stack[-1]
+            for part in parts:
+                if isinstance(part, ComponentHtml):
+                    if part.has_parent(parent):
+                        stack.append((iter(self._render_parts(part)), part))
+                        break
+                    part.render(buffer)
+                    continue
+                buffer.append(unicode(part))
+            else:
+                stack.pop()
+        return u''.join(buffer)
+
+    def _render_parts(self, component):
+        node_id = self.node_id(component) # ids in document order
+        parts = self._parts(component)
+        self._sent[component] = (component._html, self._shape(component, parts))
+        if self._has_id(component, parts):
+            position = len(component.tag_name) + 1
+            parts[0] = u'%s %s="%s"%s' % (parts[0][:position], self.attribute, node_id, parts[0][position:])
+        return parts
@@ -0,0 +1,96 @@
+# coding: utf-8
+import re
+
+
+class Markup(unicode):
+    """
+    unicode string that is already HTML: it is not escaped again.
+    """
+    __slots__ = ()
+
+    def __html__(self):
+        return self
+
+
+# Characters that must be escaped in text and in attribute values, '&' first.
+# unicode.translate looks up every character in a dict, the replace calls are about 4 times faster.
+ESCAPES = (
+    (u'&', u'&amp;'),
+    (u'<', u'&lt;'),
+    (u'>', u'&gt;'),
+    (u'"', u'&#34;'),
+    (u"'", u'&#39;'),
+)
+needs_escaping = re.compile(u'[&<>"\']').search
+# Joins the values of escape_many, so a whole row is translated at once. It is not escaped.
+_SEPARATOR = u'\x00'
+_NUMBERS = (int, long, float)
+_UNICODE = set([unicode])
+
+
+def _translate(value):
+    for character, entity in ESCAPES:
+        if character in value:
+            value = value.replace(character, entity)
+    return value
+
+
+def escape(value):
+    """
+    Markup with the HTML of @value: Markup and objects with an __html__ method are kept,
+    anything else is converted to unicode and escaped.
+    """
+    if isinstance(value, Markup):
+        return value
+    if not isinstance(value, basestring):
+        if isinstance(value, _NUMBERS):
+            return Markup(value)
+        if hasattr(value, '__html__'):
+            return Markup(value.__html__())
+    value = unicode(value)
+    if needs_escaping(value) is None:
+        return Markup(value)
+    return Markup(_translate(value))
+
+
+def escape_many(values):
+    """
+    List with the escaped HTML (unicode strings) of each one of @values, e.g. the cells of a row.
+    The strings are joined and translated once, instead of being escaped one by one.
+    """
+    if not isinstance(values, list):
+        values = list(values)
+    if set(map(type, values)) <= _UNICODE: # fast path, e.g. rows of text
+        joined = _SEPARATOR.join(values)
+        if needs_escaping(joined) is None:
+            return list(values)
+        escaped = _translate(joined).split(_SEPARATOR)
+        if len(escaped) == len(values):
+            return escaped
+    result = []
+    positions = []
+    for value in values:
+        if isinstance(value, unicode):
+            if not isinstance(value, Markup):
+                positions.append(len(result))
+            result.append(value)
+        elif isinstance(value, _NUMBERS):
+            result.append(unicode(value))
+        elif hasattr(value, '__html__'):
+            result.append(value.__html__())
+        else:
+            positions.append(len(result))
+            result.append(unicode(value))
+    if not positions:
+        return result
+    joined = _SEPARATOR.join([result[position] for position in positions])
+    if needs_escaping(joined) is None:
+        return result
+    escaped = _translate(joined).split(_SEPARATOR)
+    if len(escaped) == len(positions):
+        for position, value in zip(positions, escaped):
+            result[position] = value
+    else: # some value has the separator
+        for position in positions:
+            result[position] = _translate(result[position])
+    return result
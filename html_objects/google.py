@@ -1,34 +1,109 @@
 # coding: utf-8
+import re
 
-from html_objects.components import Panel, Link, Image
+from html_objects.cache import LocalCacheBackend
+from html_objects.components import Panel
+from html_objects.escaping import Markup, escape
 
 
-class GoogleAdSenseComponent(Panel):
+_PARAMETER = r'%\((\w+)\)([se])'
 
-    def __init__(self, client, slot, width, height, **kwargs):
-        super(GoogleAdSenseComponent, self).__init__(**kwargs)
-        adsense_code = """<script type="text/javascript"><!--
-google_ad_client = "%s";
-google_ad_slot = "%s";
-google_ad_width = %s;
-google_ad_height = %s;
+
+class Snippet(object):
+    """
+    HTML with parameters: %(name)s is replaced by the value of the parameter and %(name)e by its escaped value.
+    The template is split once into the static parts and the parameters, and the HTML of the last
+    @cache_size tuples of values is kept, so a snippet with the same values is not formatted again.
+    Both are done when the snippet is first rendered, not when the module is imported.
+    """
+    def __init__(self, template, cache_size=1000):
+        self.template = template
+        self.cache_size = cache_size
+        self._cache = None
+
+    def _split(self):
+        parts = re.split(_PARAMETER, self.template)
+        # static, name, kind, static, name, kind, ..., static
+        self._static = parts[0::3]
+        self._parameters = zip(parts[1::3], [kind == u'e' for kind in parts[2::3]])
+        self.names = tuple(sorted(set(parts[1::3])))
+        self._cache = LocalCacheBackend(max_size=self.cache_size)
+
+    def render(self, **values):
+        if self._cache is None:
+            self._split()
+        # The types are part of the key: equal values of other types, e.g. Markup and unicode, or True and 1,
+        # are converted to other strings.
+        key = tuple((type(values[name]), values[name]) for name in self.names)
+        html = self._cache.get(key)
+        if html is None:
+            html = [self._static[0]]
+            for (name, escaped), static in zip(self._parameters, self._static[1:]):
+                value = values[name]
+                html.append(escape(value) if escaped else unicode(value))
+                html.append(static)
+            html = Markup(u''.join(html))
+            self._cache.set(key, html)
+        return html
+
+
+# Name -> (Snippet, Snippet that loads its scripts without blocking the page), see register_embed.
+EMBEDS = {}
+
+
+def register_embed(name, template, deferred_template=None, cache_size=1000):
+    """
+    Registers the template of the HTML of an embed, e.g. a third-party widget, rendered by EmbedComponent.
+    @deferred_template: the same HTML loading the scripts asynchronously. By default, the @template.
+    """
+    snippet = Snippet(template, cache_size)
+    deferred = Snippet(deferred_template, cache_size) if deferred_template is not None else snippet
+    EMBEDS[name] = (snippet, deferred)
+
+
+class EmbedComponent(Panel):
+    """
+    <div> with the HTML of a registered embed. Subclasses define the name of the embed and its parameters.
+    """
+    __slots__ = ()
+
+    embed = None
+    # Attributes of the <div>, e.g. dict(clazz=u'google-maps').
+    attributes = {}
+
+    def __init__(self, values, defer=False, **kwargs):
+        """
+        @values: dict with the parameters of the embed.
+        @defer: renders the deferred template, so the scripts do not block the rendering of the page.
+        """
+        if self.attributes:
+            attributes = dict(self.attributes)
+            attributes.update(kwargs)
+            kwargs = attributes
+        super(EmbedComponent, self).__init__(**kwargs)
+        self.add_component(EMBEDS[self.embed][1 if defer else 0].render(**values))
+
+
+register_embed('google-adsense', u'''<script type="text/javascript"><!--
+google_ad_client = "%(client)s";
+google_ad_slot = "%(slot)s";
+google_ad_width = %(width)s;
+google_ad_height = %(height)s;
 //-->
 </script>
 <script type="text/javascript"
 src="http://pagead2.googlesyndication.com/pagead/show_ads.js">
-</script>""" % (client, slot, width, height)
-        self.add_component(adsense_code)
+</script>''', deferred_template=u'''<script async="async" src="//pagead2.googlesyndication.com/pagead/js/adsbygoogle.js"></script>
+<ins class="adsbygoogle" style="display:inline-block;width:%(width)epx;height:%(height)epx" \
+data-ad-client="%(client)e" data-ad-slot="%(slot)e"></ins>
+<script type="text/javascript">(adsbygoogle = window.adsbygoogle || []).push({});</script>''')
 
-
-class GoogleAnalyticsComponent(Panel):
-    
-    def __init__(self, id, **kwargs):
-        super(GoogleAnalyticsComponent, self).__init__(clazz='google-analytics', **kwargs)
-        ga_code = r"""
+# ga.js is always loaded asynchronously.
+register_embed('google-analytics', u'''
 <script type="text/javascript">
 
   var _gaq = _gaq || [];
-  _gaq.push(['_setAccount', '%s']);
+  _gaq.push(['_setAccount', '%(id)s']);
   _gaq.push(['_trackPageview']);
 
   (function() {
@@ -38,16 +113,40 @@ class GoogleAnalyticsComponent(Panel):
   })();
 
 </script>
-""" % id
-        self.add_component(ga_code)
+''')
+
+_static_map = (u'http://maps.google.com/maps/api/staticmap?center=%(address)e&amp;zoom=%(zoom)e&amp;size=%(size)e'
+               u'&amp;sensor=true&amp;markers=color:blue%(address)e')
+# Static image, without scripts.
+register_embed('google-maps', u'<a href="%s" target="_blank">%%(address)s</a><br></br>'
+                              u'<a href="%s" target="_blank"><img src="%s"/></a>' % (_static_map, _static_map, _static_map))
+
+
+class GoogleAdSenseComponent(EmbedComponent):
+    __slots__ = ()
+
+    embed = 'google-adsense'
+
+    def __init__(self, client, slot, width, height, defer=False, **kwargs):
+        super(GoogleAdSenseComponent, self).__init__(dict(client=client, slot=slot, width=width, height=height),
+                                                     defer, **kwargs)
+
+
+class GoogleAnalyticsComponent(EmbedComponent):
+    __slots__ = ()
+
+    embed = 'google-analytics'
+    attributes = dict(clazz='google-analytics')
+
+    def __init__(self, id, defer=False, **kwargs):
+        super(GoogleAnalyticsComponent, self).__init__(dict(id=id), defer, **kwargs)
+
+
+class GoogleMapsComponent(EmbedComponent):
+    __slots__ = ()
 
+    embed = 'google-maps'
+    attributes = dict(clazz='google-maps')
 
-class GoogleMapsComponent(Panel):
-    
     def __init__(self, address, size='200x200', zoom='16', **kwargs):
-        super(GoogleMapsComponent, self).__init__(clazz='google-maps', **kwargs)
-        href = 'http://maps.google.com/maps/api/staticmap?center=%s&zoom=%s&size=%s&sensor=true&markers=color:blue%s' % (address, zoom, size, address)
-        self.add_component(Link(href, address, target='_blank'))
-        self.add_component(self.tag('br', ''))
-        self.add_component(Link(href, Image(href), target='_blank'))
-    
\ No newline at end of file
+        super(GoogleMapsComponent, self).__init__(dict(address=address, size=size, zoom=zoom), **kwargs)
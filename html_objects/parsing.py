@@ -0,0 +1,244 @@
+# coding: utf-8
+import hashlib
+
+try:
+    from HTMLParser import HTMLParser
+except ImportError: # Python 3
+    from html.parser import HTMLParser
+
+from html_objects.cache import LocalCacheBackend
+from html_objects.components import ComponentHtml, SimpleComponentHtml, Fragment, Panel, Chunk, Link, Image,\
+    Paragraph, UnorderedList, OrderedList, Table, Form, TextBox, CheckBox, UploadBox, Select, SubmitButton,\
+    HiddenField, Button
+
+
+VOID_TAGS = frozenset(['area', 'base', 'br', 'col', 'embed', 'hr', 'img', 'input', 'link', 'meta', 'param',
+                       'source', 'track', 'wbr'])
+# Parsed trees of the markups, by hash of the markup.
+PARSED_HTML_CACHE = LocalCacheBackend(max_size=1000)
+
+
+def _input(attrs):
+    input_type = (attrs.pop('type', None) or u'text').lower()
+    if input_type == u'text':
+        return TextBox(attrs.pop('name', None), attrs.pop('value', None), maxlength=attrs.pop('maxlength', None), **attrs)
+    if input_type == u'checkbox':
+        return CheckBox(attrs.pop('name', None), **attrs)
+    if input_type == u'file':
+        return UploadBox(attrs.pop('name', None), attrs.pop('value', None), **attrs)
+    if input_type == u'submit':
+        return SubmitButton(attrs.pop('id', None), attrs.pop('value', None), **attrs)
+    if input_type == u'hidden':
+        return HiddenField(attrs.pop('id', None), attrs.pop('value', None), **attrs)
+    return SimpleComponentHtml(u'input', type=input_type, **attrs)
+
+
+def _select(attrs):
+    multiple = attrs.pop('multiple', None) is not None
+    return Select(attrs.pop('name', None), multiple=multiple, **attrs)
+
+
+# Tag name -> function that creates the component of the tag from its attributes.
+COMPONENT_FACTORIES = {
+    'div': lambda attrs: Panel(**attrs),
+    'span': lambda attrs: Chunk(**attrs),
+    'a': lambda attrs: Link(attrs.pop('href', None), u'', **attrs),
+    'img': lambda attrs: Image(attrs.pop('src', None), **attrs),
+    'p': lambda attrs: Paragraph(u'', **attrs),
+    'ul': lambda attrs: UnorderedList(**attrs),
+    'ol': lambda attrs: OrderedList(**attrs),
+    'table': lambda attrs: Table(**attrs),
+    'form': lambda attrs: Form(attrs.pop('action', None), method=attrs.pop('method', None), **attrs),
+    'input': _input,
+    'select': _select,
+    'button': lambda attrs: Button(attrs.pop('id', None), **attrs),
+}
+# Components whose nodes are only tags: the whitespace between the tags is dropped.
+_STRUCTURAL_TAGS = frozenset(['table', 'colgroup', 'thead', 'tbody', 'tfoot', 'tr', 'select', 'ul', 'ol'])
+# Tags of a table that are not lines, inserted in the table in their position (see ComponentParser._add_to_table).
+_TABLE_TAGS = frozenset(['caption', 'colgroup', 'col', 'tfoot'])
+
+
+class ComponentParser(HTMLParser):
+    """
+    Incremental parser of HTML into component trees: feed it the markup in chunks, e.g. of a large file,
+    and take the top-level nodes parsed so far with pop_nodes.
+    Tags are created with the classes of COMPONENT_FACTORIES, tables are rebuilt with the Table methods
+    (so the lines have the Table classes) and options are added to their Select. Other tags are ComponentHtml.
+    Text, entities and comments are kept as HTML strings.
+    """
+    def __init__(self):
+        HTMLParser.__init__(self)
+        # Top-level nodes, and the ones that are still open.
+        self.nodes = []
+        # [tag name, component that receives the nodes, Table or Select that owns the tag or None]
+        self._open = []
+
+    def pop_nodes(self):
+        "Top-level nodes whose tags are closed, removed from the parser."
+        count = len(self.nodes) - (1 if self._open else 0)
+        nodes = self.nodes[:count]
+        del self.nodes[:count]
+        return nodes
+
+    def _add(self, node):
+        if not self._open:
+            self.nodes.append(node)
+            return
+        tag, container, _ = self._open[-1]
+        if tag in _STRUCTURAL_TAGS and not isinstance(node, ComponentHtml):
+            if not node.strip():
+                return
+        container.add_component(node)
+
+    def handle_starttag(self, tag, attrs):
+        kwargs = {}
+        for name, value in attrs:
+            if value is None:
+                value = name
+            kwargs[str(_HTML_NAMES.get(name, name))] = value
+        table = self._open[-1][2] if self._open else None
+        if isinstance(table, Table) and tag in ('thead', 'tbody', 'tr'):
+            if tag == 'thead':
+                self._open.append([tag, table._header, table])
+            elif tag == 'tbody':
+                self._open.append([tag, table._body, table])
+            elif self._open[-1][0] == 'thead':
+                table._header_line = ComponentHtml(u'tr', **kwargs)
+                table._header.add_component(table._header_line)
+                self._open.append([tag, table._header_line, None])
+            else:
+                # The line keeps its attributes, instead of the ones of Table.start_line.
+                table._body_line = ComponentHtml(u'tr', **kwargs)
+                table._body.add_component(table._body_line)
+                table._line_index += 1
+                self._open.append([tag, table._body_line, None])
+            return
+        factory = COMPONENT_FACTORIES.get(tag)
+        if factory is not None:
+            component = factory(kwargs)
+        elif tag in VOID_TAGS:
+            component = SimpleComponentHtml(tag, **kwargs)
+        else:
+            component = ComponentHtml(tag, **kwargs)
+        if tag == 'option' and self._open and isinstance(self._open[-1][2], Select):
+            # Added to the Select when it is closed, with its label.
+            self._open.append([tag, component, self._open[-1][2]])
+            return
+        if tag in _TABLE_TAGS and self._open and isinstance(self._open[-1][1], Table):
+            self._add_to_table(self._open[-1][1], tag, component)
+        else:
+            self._add(component)
+        if tag not in VOID_TAGS:
+            self._open.append([tag, component, component if isinstance(component, (Table, Select)) else None])
+
+    def _add_to_table(self, table, tag, component):
+        """
+        Inserts a caption, colgroup or col before the thead of @table, and a tfoot before its tbody
+        if no line was parsed yet. A tfoot after the lines is appended, as HTML5 allows.
+        """
+        if tag == 'tfoot':
+            if table._body.children:
+                table.add_component(component)
+                return
+            before = table._body
+        else:
+            before = table._header
+        children = table._writable('_children')
+        children.insert(children.index(before), component)
+        component.add_parent(table)
+        table.changed()
+
+    def handle_startendtag(self, tag, attrs):
+        self.handle_starttag(tag, attrs)
+        if tag not in VOID_TAGS:
+            self.handle_endtag(tag)
+
+    def handle_endtag(self, tag):
+        for index in range(len(self._open) - 1, -1, -1):
+            if self._open[index][0] == tag:
+                break
+        else:
+            return
+        while len(self._open) > index:
+            name, component, owner = self._open.pop()
+            if name == 'option' and isinstance(owner, Select) and component is not owner:
+                self._close_option(owner, component)
+
+    def _close_option(self, select, option):
+        children = list(option._children)
+        label = children[0] if len(children) == 1 else Fragment()
+        if len(children) != 1:
+            for child in children:
+                label.add_component(child)
+        value = option.get('value')
+        if value is None:
+            value = u''.join(child for child in children if not isinstance(child, ComponentHtml))
+        select._add_option(label, value, selected=option.get('selected') is not None)
+
+    def handle_data(self, data):
+        self._add(data)
+
+    def handle_entityref(self, name):
+        self._add(u'&%s;' % name)
+
+    def handle_charref(self, name):
+        self._add(u'&#%s;' % name)
+
+    def handle_comment(self, data):
+        self._add(u'<!--%s-->' % data)
+
+    def handle_decl(self, decl):
+        self._add(u'<!%s>' % decl)
+
+    def handle_pi(self, data):
+        self._add(u'<?%s>' % data)
+
+    def close(self):
+        HTMLParser.close(self)
+        while self._open:
+            self.handle_endtag(self._open[-1][0])
+
+
+# HTML attribute name -> keyword name, the inverse of ComponentHtml.ATTRIBUTE_NAMES.
+_HTML_NAMES = dict((html_name, name) for name, html_name in ComponentHtml.ATTRIBUTE_NAMES.items())
+
+
+def iter_parse(chunks):
+    """
+    Generator of the top-level nodes (components and HTML strings) of the markup in @chunks,
+    an iterable of unicode strings (e.g. a file), each one yielded as soon as its tag is closed.
+    """
+    parser = ComponentParser()
+    for chunk in chunks:
+        parser.feed(chunk)
+        for node in parser.pop_nodes():
+            yield node
+    parser.close()
+    for node in parser.nodes:
+        yield node
+
+
+def parse_html(markup, cache=PARSED_HTML_CACHE):
+    """
+    Component of the @markup: the component of its tag, or a Fragment if it has many top-level nodes.
+    Parsed trees are kept in @cache (a html_objects.cache.CacheBackend, or None) by the hash of the markup,
+    and a clone of the tree is returned, so each markup is parsed once and the result can be changed.
+    """
+    key = None
+    if cache is not None:
+        key = 'html-%s' % hashlib.sha1(markup.encode('utf-8')).hexdigest()
+        component = cache.get(key)
+        if component is not None:
+            return component.clone()
+    nodes = list(iter_parse([markup]))
+    if len(nodes) == 1 and isinstance(nodes[0], ComponentHtml):
+        component = nodes[0]
+    else:
+        component = Fragment()
+        for node in nodes:
+            component.add_component(node)
+    if cache is None:
+        return component
+    cache.set(key, component)
+    return component.clone()
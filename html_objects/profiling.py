@@ -0,0 +1,151 @@
+# coding: utf-8
+import json
+import marshal
+from contextlib import contextmanager
+
+from html_objects.components import ComponentHtml
+
+
+class RenderHook(object):
+    """
+    Interface of ComponentHtml.render_hook. Every component of the rendered tree is reported
+    either as started and then rendered, or as reused (kept HTML or fragment cache).
+    """
+    def component_started(self, component):
+        pass
+
+    def component_rendered(self, component, parent, elapsed, own_elapsed, size):
+        """
+        @elapsed: seconds rendering the component tree. @own_elapsed: the same, excluding the rendered children.
+        @size: characters of the HTML of the component tree.
+        """
+        pass
+
+    def component_reused(self, component, parent, size):
+        pass
+
+
+def _new_record():
+    return dict(renders=0, reused=0, time=0.0, own_time=0.0, size=0, children=0, assets=0)
+
+
+class RenderProfiler(RenderHook):
+    """
+    Render count and time, HTML size, child count and asset count per component class
+    and, with @instances, per component.
+    Compatible with pstats: pstats.Stats(profiler) or profiler.dump_stats(filename).
+    """
+    def __init__(self, instances=False):
+        self.instances = instances
+        self.classes = {}
+        self.components = {}
+        # (class, parent class) -> [renders, primitive renders, own time, cumulative time]
+        self.calls = {}
+        # Classes being rendered -> nesting depth, so recursive renders are not counted twice in the cumulative time.
+        self._active = {}
+        self.time = 0.0
+
+    def _records(self, component):
+        cls = type(component)
+        record = self.classes.get(cls)
+        if record is None:
+            record = self.classes[cls] = _new_record()
+        records = [record]
+        if self.instances:
+            record = self.components.get(id(component))
+            if record is None:
+                record = self.components[id(component)] = _new_record()
+                record['class'] = cls.__name__
+            records.append(record)
+        return records
+
+    def component_started(self, component):
+        cls = type(component)
+        self._active[cls] = self._active.get(cls, 0) + 1
+
+    def component_rendered(self, component, parent, elapsed, own_elapsed, size):
+        cls = type(component)
+        depth = self._active[cls] = self._active[cls] - 1
+        children = len(component.child_components())
+        assets = 0
+        if component._assets is not None:
+            registry = component._assets
+            assets = len(registry.css_libraries) + len(registry.javascript_libraries) + \
+                len(registry._scripts) + len(registry._jquery_init_codes)
+        records = self._records(component)
+        if depth == 0:
+            records[0]['time'] += elapsed
+        for record in records[1:]:
+            record['time'] += elapsed
+        for record in records:
+            record['renders'] += 1
+            record['own_time'] += own_elapsed
+            record['size'] += size
+            record['children'] += children
+            record['assets'] += assets
+        call = self.calls.setdefault((cls, type(parent) if parent is not None else None), [0, 0, 0.0, 0.0])
+        call[0] += 1
+        call[2] += own_elapsed
+        if depth == 0:
+            call[1] += 1
+            call[3] += elapsed
+        if parent is None:
+            self.time += elapsed
+
+    def component_reused(self, component, parent, size):
+        for record in self._records(component):
+            record['reused'] += 1
+            record['size'] += size
+
+    def summary(self):
+        """
+        dict with the total render time and the records of the classes (and of the components), by name.
+        """
+        summary = dict(time=self.time, classes=dict(
+            ('%s.%s' % (cls.__module__, cls.__name__), dict(record)) for cls, record in self.classes.items()))
+        if self.instances:
+            summary['components'] = dict((str(key), dict(record)) for key, record in self.components.items())
+        return summary
+
+    def to_json(self, **kwargs):
+        return json.dumps(self.summary(), sort_keys=True, **kwargs)
+
+    @classmethod
+    def _function(cls, component_class):
+        "pstats (file, line, function) of a component class."
+        if component_class is None:
+            return ('~', 0, '<render>')
+        return (component_class.__module__, 0, component_class.__name__)
+
+    def create_stats(self):
+        "Stats in the format of cProfile, in self.stats."
+        self.stats = {}
+        for (cls, parent), (renders, primitive_renders, own_time, time) in self.calls.items():
+            function = self._function(cls)
+            cc, nc, tt, ct, callers = self.stats.get(function, (0, 0, 0.0, 0.0, {}))
+            callers[self._function(parent)] = (renders, primitive_renders, own_time, time)
+            self.stats[function] = (cc + primitive_renders, nc + renders, tt + own_time, ct + time, callers)
+
+    def dump_stats(self, filename):
+        "Saves the stats in a file that can be loaded with pstats.Stats(filename)."
+        self.create_stats()
+        with open(filename, 'wb') as output:
+            marshal.dump(self.stats, output)
+
+
+@contextmanager
+def profile_rendering(hook=None):
+    """
+    Reports the renders done in the block to @hook, by default a new RenderProfiler.
+        with profile_rendering() as profiler:
+            page.as_html()
+        print profiler.to_json(indent=2)
+    """
+    if hook is None:
+        hook = RenderProfiler()
+    previous = ComponentHtml.render_hook
+    ComponentHtml.render_hook = hook
+    try:
+        yield hook
+    finally:
+        ComponentHtml.render_hook = previous
@@ -0,0 +1,337 @@
+# coding: utf-8
+"""
+Compact serialization of component trees, e.g. to cache them or to send them to render workers.
+
+The tree is stored as tables: the strings (tag names, attribute names and values, texts), the classes,
+the other values and the nodes. The nodes are a flat array of integers that refer to the strings, values
+and other nodes by their position in the tables, so every string is stored once and shared components
+are kept shared. The tables are encoded with marshal.
+"""
+import array
+import marshal
+import mmap
+import sys
+
+from html_objects.components import ComponentHtml, AssetRegistry, EMPTY_ATTRIBUTES
+from html_objects.escaping import Markup
+
+
+FORMAT = b'HOB2'
+# Slots of every component that are stored in the nodes, the others are stored as references.
+_NODE_SLOTS = frozenset(['tag_name', 'kwargs', '_children'])
+_PRIMITIVES = frozenset([bool, int, long, float])
+# Kinds of the values table. _MARSHAL: containers without components and Markup, stored as they are.
+_PRIMITIVE, _LIST, _TUPLE, _SET, _DICT, _ASSETS, _MARSHAL = range(7)
+_CONTAINERS = {list: _LIST, tuple: _TUPLE, set: _SET, frozenset: _SET}
+# References: -1 is None, the others are 3 * position + table (strings, values or nodes).
+_NONE = -1
+_STRING, _VALUE, _NODE = range(3)
+
+
+def _array(data=None):
+    "Array of 32-bit integers, stored little-endian."
+    ints = array.array('i')
+    if data is not None:
+        ints.fromstring(data)
+        if sys.byteorder == 'big':
+            ints.byteswap()
+    return ints
+
+
+def _array_bytes(ints):
+    if sys.byteorder == 'big':
+        ints = array.array('i', ints)
+        ints.byteswap()
+    return ints.tostring()
+
+
+_value_slots_cache = {}
+
+
+def _value_slots(cls):
+    "Slots of the components of @cls that are stored as references. The derived_slots are rebuilt instead."
+    try:
+        return _value_slots_cache[cls]
+    except KeyError:
+        names = _value_slots_cache[cls] = tuple(name for name in cls._state_slots()
+                                                if name not in _NODE_SLOTS and name not in cls.derived_slots)
+        return names
+
+
+class _Encoder(object):
+
+    def __init__(self):
+        self.strings = []
+        self._string_indexes = {}
+        self.markups = []
+        self.classes = []
+        self._class_indexes = {}
+        self.values = []
+        self._primitive_indexes = {}
+        # Components in the order of the nodes, with the position of their classes.
+        self.components = []
+        self._node_indexes = {}
+        self.node_classes = _array()
+        self.nodes = _array()
+
+    def string(self, value):
+        key = (type(value), value)
+        try:
+            return self._string_indexes[key]
+        except KeyError:
+            index = self._string_indexes[key] = len(self.strings)
+            if isinstance(value, Markup):
+                self.markups.append(index)
+                value = unicode(value)
+            self.strings.append(value)
+            return index
+
+    def node(self, component):
+        "Position of the node of @component, which is encoded after the nodes before it."
+        try:
+            return self._node_indexes[id(component)]
+        except KeyError:
+            pass
+        cls = type(component)
+        class_index = self._class_indexes.get(cls)
+        if class_index is None:
+            class_index = self._class_indexes[cls] = len(self.classes)
+            self.classes.append('%s:%s' % (cls.__module__, cls.__name__))
+        index = self._node_indexes[id(component)] = len(self.components)
+        self.components.append(component)
+        self.node_classes.append(class_index)
+        return index
+
+    def reference(self, value):
+        if value is None:
+            return _NONE
+        if isinstance(value, basestring):
+            return 3 * self.string(value) + _STRING
+        if isinstance(value, ComponentHtml):
+            return 3 * self.node(value) + _NODE
+        if type(value) in _PRIMITIVES:
+            key = (type(value), value)
+            index = self._primitive_indexes.get(key)
+            if index is None:
+                index = self._primitive_indexes[key] = len(self.values)
+                self.values.append((_PRIMITIVE, value))
+            return 3 * index + _VALUE
+        index = len(self.values)
+        self.values.append(None)
+        self.values[index] = self.value(value)
+        return 3 * index + _VALUE
+
+    def value(self, value):
+        value_type = type(value)
+        kind = _CONTAINERS.get(value_type)
+        if kind is not None or value_type is dict:
+            if value:
+                try:
+                    marshal.dumps(value) # e.g. the rows of a TableRows, in C
+                    return (_MARSHAL, value)
+                except ValueError:
+                    pass
+            if kind is not None:
+                return (kind, tuple(self.reference(item) for item in value))
+        if isinstance(value, dict):
+            if value is EMPTY_ATTRIBUTES:
+                return (_DICT, None)
+            references = []
+            for key, item in value.iteritems():
+                references.append(self.reference(key))
+                references.append(self.reference(item))
+            return (_DICT, tuple(references))
+        if value_type is AssetRegistry:
+            return (_ASSETS, tuple(self.reference(values) for values in (
+                value.css_libraries, value.javascript_libraries, value._scripts, value._jquery_init_codes)))
+        raise TypeError('%r cannot be serialized' % (value,))
+
+    def encode(self, component):
+        """
+        Node of every component of the tree of @component: tag, attribute count (-1 without attributes),
+        (name, value) references, child count, child references, 0 or 1 and the references of the other slots.
+        """
+        self.node(component)
+        nodes = self.nodes
+        reference = self.reference
+        position = 0
+        while position < len(self.components):
+            component = self.components[position]
+            position += 1
+            nodes.append(-1 if component.tag_name is None else self.string(component.tag_name))
+            attributes = component.kwargs
+            if attributes is EMPTY_ATTRIBUTES:
+                nodes.append(-1)
+            else:
+                nodes.append(len(attributes))
+                for name, value in attributes.iteritems():
+                    nodes.append(self.string(name))
+                    nodes.append(reference(value))
+            children = component._children
+            nodes.append(len(children))
+            for child in children:
+                nodes.append(reference(child))
+            state = [reference(getattr(component, name, None)) for name in _value_slots(type(component))]
+            if hasattr(component, '__dict__'):
+                state.append(reference(component.__dict__))
+            if any(item != _NONE for item in state):
+                nodes.append(1)
+                nodes.extend(state)
+            else:
+                nodes.append(0)
+
+
+def dumps(component):
+    """
+    bytes of the tree of @component. Every attribute of the components must be a string, a number, None,
+    a component, an AssetRegistry or a list, tuple, set or dict of them: streams of rows and futures
+    (AsyncContent) cannot be serialized.
+    """
+    encoder = _Encoder()
+    encoder.encode(component)
+    return FORMAT + marshal.dumps((tuple(encoder.strings), tuple(encoder.markups), tuple(encoder.classes),
+                                   tuple(encoder.values), _array_bytes(encoder.node_classes),
+                                   _array_bytes(encoder.nodes)))
+
+
+class _Decoder(object):
+
+    def __init__(self, strings, values, components):
+        self.strings = strings
+        self.values = values
+        self.components = components
+
+    def reference(self, reference):
+        if reference == _NONE:
+            return None
+        index, table = divmod(reference, 3)
+        if table == _STRING:
+            return self.strings[index]
+        if table == _NODE:
+            return self.components[index]
+        kind, value = self.values[index]
+        if kind == _PRIMITIVE or kind == _MARSHAL:
+            return value
+        if kind == _LIST:
+            return [self.reference(item) for item in value]
+        if kind == _TUPLE:
+            return tuple(self.reference(item) for item in value)
+        if kind == _SET:
+            return set(self.reference(item) for item in value)
+        if kind == _DICT:
+            if value is None:
+                return EMPTY_ATTRIBUTES
+            return dict((self.reference(value[position]), self.reference(value[position + 1]))
+                        for position in range(0, len(value), 2))
+        registry = AssetRegistry()
+        for css_library in self.reference(value[0]):
+            registry.add_css_library(css_library)
+        for javascript_library in self.reference(value[1]):
+            registry.add_javascript_library(javascript_library)
+        registry._scripts = self.reference(value[2])
+        registry._jquery_init_codes = self.reference(value[3])
+        return registry
+
+    def decode(self, nodes):
+        strings = self.strings
+        components = self.components
+        reference = self.reference
+        position = 0
+        for component in components:
+            tag = nodes[position]
+            component.tag_name = None if tag == -1 else strings[tag]
+            count = nodes[position + 1]
+            position += 2
+            if count == -1:
+                component.kwargs = EMPTY_ATTRIBUTES
+            else:
+                attributes = component.kwargs = {}
+                end = position + 2 * count
+                while position < end:
+                    value = nodes[position + 1]
+                    # Strings are looked up here, it is the most common reference.
+                    attributes[strings[nodes[position]]] = strings[value // 3] if value % 3 == _STRING else reference(value)
+                    position += 2
+            count = nodes[position]
+            position += 1
+            if count:
+                component._children = [strings[child // 3] if child % 3 == _STRING else reference(child)
+                                       for child in nodes[position:position + count]]
+                position += count
+            else:
+                component._children = ()
+            names = _value_slots(type(component))
+            has_state = nodes[position]
+            position += 1
+            if has_state:
+                for name in names:
+                    setattr(component, name, reference(nodes[position]))
+                    position += 1
+                if hasattr(component, '__dict__'):
+                    component.__dict__.update(reference(nodes[position]))
+                    position += 1
+            else:
+                for name in names:
+                    setattr(component, name, None)
+            component._html = None
+            component._parents = ()
+            component._copy_on_write = ()
+            component._clones = ()
+            component._clone_epoch = ComponentHtml._clones_made
+        for component in components:
+            for child in component.child_components():
+                child.add_parent(component)
+        for component in components:
+            if component.derived_slots:
+                component._rebuild_derived_slots()
+
+
+_classes = {}
+
+
+def _load_class(name):
+    try:
+        return _classes[name]
+    except KeyError:
+        module_name, class_name = name.split(':')
+        __import__(module_name)
+        cls = getattr(sys.modules[module_name], class_name)
+        if not (isinstance(cls, type) and issubclass(cls, ComponentHtml)):
+            raise ValueError('%s is not a component class' % name)
+        _classes[name] = cls
+        return cls
+
+
+def loads(data):
+    "Component tree of the bytes @data of dumps, or of a buffer with them, e.g. a mmap, which is not copied."
+    if data[:len(FORMAT)] != FORMAT:
+        raise ValueError('not a serialized component tree')
+    strings, markups, classes, values, node_classes, nodes = marshal.loads(buffer(data, len(FORMAT)))
+    strings = list(strings)
+    for index in markups:
+        strings[index] = Markup(strings[index])
+    classes = [_load_class(name) for name in classes]
+    components = [classes[index].__new__(classes[index]) for index in _array(node_classes)]
+    _Decoder(strings, values, components).decode(_array(nodes))
+    return components[0]
+
+
+def dump(component, stream):
+    stream.write(dumps(component))
+
+
+def load(stream):
+    """
+    Component tree of the file object @stream, written by dump. Files are mapped into memory with mmap
+    and decoded straight from the mapping, so a cache file shared by many processes is read from the page cache,
+    without reading it through the file object or copying it into a string.
+    """
+    try:
+        fileno = stream.fileno()
+    except (AttributeError, IOError, ValueError):
+        return loads(stream.read())
+    mapped = mmap.mmap(fileno, 0, access=mmap.ACCESS_READ)
+    try:
+        return loads(mapped)
+    finally:
+        mapped.close()
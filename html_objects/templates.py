@@ -0,0 +1,83 @@
+# coding: utf-8
+from html_objects.components import ComponentHtml
+
+
+class Slot(ComponentHtml):
+    """
+    Placeholder of a compiled Template. Until it is compiled, it renders its default content without a tag.
+    """
+    __slots__ = ('name',)
+
+    def __init__(self, name, innerHtml=u''):
+        super(Slot, self).__init__(None, innerHtml=innerHtml)
+        self.name = name
+
+    #override
+    def html_parts(self):
+        return list(self._children)
+
+
+class Template(object):
+    """
+    Component tree pre-rendered into constant strings, with the Slots left open.
+    Libraries and scripts are the ones collected when the tree was compiled.
+    """
+    def __init__(self, parts, slot_positions, defaults):
+        # Static strings, with None in the positions of the slots.
+        self._parts = parts
+        # (position, slot name)
+        self._slot_positions = slot_positions
+        self.defaults = defaults
+
+    @property
+    def slot_names(self):
+        return [name for _, name in self._slot_positions]
+
+    @classmethod
+    def from_component(cls, component):
+        parts = []
+        static = []
+        slot_positions = []
+        defaults = {}
+        stack = [iter([component])]
+        while stack:
+            for part in stack[-1]:
+                if isinstance(part, Slot):
+                    if static:
+                        parts.append(u''.join(static))
+                        static = []
+                    slot_positions.append((len(parts), part.name))
+                    parts.append(None)
+                    defaults[part.name] = u''.join(ComponentHtml.walk_html(part.html_parts()))
+                elif isinstance(part, ComponentHtml):
+                    if part.cache_key is not None:
+                        static.append(part.cached_fragment()[0])
+                        continue
+                    stack.append(iter(part.html_parts()))
+                    break
+                else:
+                    static.append(unicode(part))
+            else:
+                stack.pop()
+        if static:
+            parts.append(u''.join(static))
+        return cls(parts, slot_positions, defaults)
+
+    def render(self, **values):
+        """
+        HTML of the template with the @values (unicode strings or components) of the slots.
+        Slots without value render the content they had when the template was compiled.
+        """
+        for name in values:
+            if name not in self.defaults:
+                raise TypeError('Template has no slot named %s' % name)
+        parts = list(self._parts)
+        for position, name in self._slot_positions:
+            try:
+                value = values[name]
+            except KeyError:
+                value = self.defaults[name]
+            else:
+                value = value.as_html() if isinstance(value, ComponentHtml) else unicode(value)
+            parts[position] = value
+        return u''.join(parts)
@@ -0,0 +1,64 @@
+from unittest import TestCase
+
+from html_objects.bundles import ScriptBundler, strip_whitespace
+from html_objects.cache import LocalCacheBackend
+from html_objects.components import Head, Page, Panel
+
+
+class StripWhitespaceTests(TestCase):
+
+    def test_indentation_and_blank_lines_are_removed(self):
+        self.assertEquals(u'a();\nb()', strip_whitespace(u'  a();  \n\n\tb()\n'))
+
+
+class ScriptBundlerTests(TestCase):
+
+    def test_same_code_returns_the_same_bundle(self):
+        bundler = ScriptBundler()
+        bundle = bundler.bundle(u'a();')
+        self.assertTrue(bundle is bundler.bundle(u'a();'))
+        self.assertTrue(bundle is bundler.get(bundle.hash))
+        self.assertNotEquals(bundle.hash, bundler.bundle(u'b();').hash)
+
+    def test_bundles_of_rendered_pages_can_be_served(self):
+        bundler = ScriptBundler(url=u'/js/%s', backend=LocalCacheBackend(max_size=2))
+        bundle = bundler.bundle(u'a();')
+        for code in (u'b();', u'c();', u'd();'):
+            bundler.bundle(code)
+            bundler.bundle(u'a();')
+        self.assertTrue(bundle is bundler.get(bundle.hash))
+
+    def test_minified_code_is_memoized(self):
+        calls = []
+        def minify(code):
+            calls.append(code)
+            return strip_whitespace(code)
+        bundler = ScriptBundler(minify=minify)
+        self.assertEquals(u'<script type="text/javascript">a();</script>', bundler.script_tag(u' a(); '))
+        bundler.script_tag(u' a(); ')
+        self.assertEquals([u' a(); '], calls)
+
+    def test_bundles_can_be_external_files(self):
+        bundler = ScriptBundler(url=u'/js/%s')
+        bundle = bundler.bundle(u'a();')
+        self.assertEquals(u'<script src="/js/bundle-%s.js" type="text/javascript"></script>' % bundle.hash, bundle.tag)
+
+
+class HeadBundleTests(TestCase):
+
+    def setUp(self):
+        self.page = Page('t', 'd', 'k')
+        panel = Panel()
+        panel.add_javascript_code(u'a();')
+        panel.add_jquery_init_code(u'b();')
+        self.page.body.add_component(panel)
+
+    def tearDown(self):
+        Head.script_bundler = None
+
+    def test_pages_render_the_script_of_the_bundler(self):
+        bundler = Head.script_bundler = ScriptBundler(url=u'/js/%s')
+        html = self.page.as_html()
+        bundle = bundler.bundle(u'a();$(document).ready(function() { b(); });')
+        self.assertTrue(bundle.tag in html)
+        self.assertFalse('b();' in html)
@@ -0,0 +1,96 @@
+from unittest import TestCase
+
+from html_objects.cache import LocalCacheBackend, MemcachedCacheBackend, FragmentCache
+from html_objects.components import ComponentHtml, Panel, Page
+
+
+class LocalCacheBackendTests(TestCase):
+
+    def test_get_return_None_for_inexistent_keys(self):
+        backend = LocalCacheBackend()
+        self.assertEquals(None, backend.get('x'))
+
+    def test_least_recently_used_entries_are_evicted(self):
+        backend = LocalCacheBackend(max_size=2)
+        backend.set('a', 1)
+        backend.set('b', 2)
+        backend.get('a')
+        backend.set('c', 3)
+        self.assertEquals(1, backend.get('a'))
+        self.assertEquals(None, backend.get('b'))
+        self.assertEquals(3, backend.get('c'))
+
+    def test_expired_entries_are_evicted(self):
+        now = [0]
+        backend = LocalCacheBackend(ttl=10, timer=lambda: now[0])
+        backend.set('a', 1)
+        now[0] = 9
+        self.assertEquals(1, backend.get('a'))
+        now[0] = 10
+        self.assertEquals(None, backend.get('a'))
+        self.assertEquals(0, len(backend))
+
+
+class FakeMemcachedClient(object):
+
+    def __init__(self):
+        self.data = {}
+
+    def get(self, key):
+        return self.data.get(key)
+
+    def set(self, key, value, time=0):
+        self.data[key] = value
+
+    def delete(self, key):
+        self.data.pop(key, None)
+
+    def flush_all(self):
+        self.data.clear()
+
+
+class MemcachedCacheBackendTests(TestCase):
+
+    def test_keys_are_prefixed(self):
+        client = FakeMemcachedClient()
+        backend = MemcachedCacheBackend(client, prefix='p:')
+        backend.set('a', 1)
+        self.assertEquals({'p:a': 1}, client.data)
+        self.assertEquals(1, backend.get('a'))
+        backend.delete('a')
+        self.assertEquals(None, backend.get('a'))
+
+
+class FragmentCacheTests(TestCase):
+
+    def setUp(self):
+        self.default_cache = ComponentHtml.fragment_cache
+        ComponentHtml.fragment_cache = FragmentCache()
+
+    def tearDown(self):
+        ComponentHtml.fragment_cache = self.default_cache
+
+    def test_cache_key_is_not_an_attribute(self):
+        self.assertEquals('<div>x</div>', Panel('x', cache_key='k').as_html())
+
+    def test_components_with_the_same_key_reuse_the_rendered_html(self):
+        self.assertEquals('<div>x</div>', Panel('x', cache_key='k').as_html())
+        self.assertEquals('<div>x</div>', Panel('y', cache_key='k').as_html())
+        self.assertEquals(dict(hits=1, misses=1), ComponentHtml.fragment_cache.stats())
+
+    def test_cached_children_are_rendered_inside_the_parent(self):
+        panel = Panel()
+        panel.add_component(Panel('x', cache_key='k'))
+        panel.add_component(Panel('x', cache_key='k'))
+        self.assertEquals('<div><div>x</div><div>x</div></div>', panel.as_html())
+
+    def test_assets_are_cached_with_the_html(self):
+        cached = Panel('x', cache_key='k')
+        cached.add_css_library('a.css')
+        page = Page('t', 'd', 'k')
+        page.body.add_component(cached)
+        page.as_html()
+        page = Page('t', 'd', 'k')
+        page.body.add_component(Panel('x', cache_key='k'))
+        self.assertTrue('href="a.css"' in page.as_html())
+        self.assertEquals(1, ComponentHtml.fragment_cache.misses)
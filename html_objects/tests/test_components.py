@@ -1,8 +1,12 @@
+import pickle
+import random
+from io import BytesIO
 from unittest import TestCase
 
 from html_objects.components import ComponentHtml, Table, Link, Image,\
     UnorderedList, Panel, OrderedList, Form, TextBox, TextArea, SubmitButton,\
-    CheckBox, Select
+    CheckBox, Select, Page, AsyncContent, StopAsyncIteration, HiddenField, SimpleComponentHtml, Chunk
+from html_objects.escaping import Markup
 
 class ComponentHtmlClassTests(TestCase):
     
@@ -26,6 +30,107 @@ class ComponentHtmlClassTests(TestCase):
     def test_creation_ignore_null_attributes(self):
         self.assertEquals('<x></x>', ComponentHtml.tag('x', '', a=None))
 
+    def test_attribute_values_are_escaped_unless_they_are_markup(self):
+        self.assertEquals('<x a="&#34;&gt;&lt;"></x>', ComponentHtml.tag('x', '', a='"><'))
+        self.assertEquals('<x a="&amp;"></x>', ComponentHtml.tag('x', '', a=Markup('&amp;')))
+
+    def test_attribute_names_can_be_registered(self):
+        ComponentHtml.register_attribute_name('data_id', u'data-id')
+        try:
+            self.assertEquals('<x data-id="1"></x>', ComponentHtml.tag('x', '', data_id=1))
+        finally:
+            del ComponentHtml.ATTRIBUTE_NAMES['data_id']
+            ComponentHtml._attribute_prefixes.clear()
+
+
+def first_version_attributes(kwargs):
+    return u''.join(u' %s="%s"' % (ComponentHtml.attribute_conversion(key), value)
+                    for key, value in kwargs.iteritems() if value)
+
+
+def first_version_tag(tag_name, innerHtml, **kwargs):
+    "ComponentHtml.tag of the first version, which rendered the components with tag(**self.kwargs)."
+    return u'<%s%s>%s</%s>' % (tag_name, first_version_attributes(kwargs), innerHtml, tag_name)
+
+
+def first_version_simple_tag(tag_name, **kwargs):
+    "ComponentHtml.simple_tag of the first version, which rendered the components with simple_tag(**self.kwargs)."
+    return u'<%s%s/>' % (tag_name, first_version_attributes(kwargs))
+
+
+class RenderCountingComponentHtml(ComponentHtml):
+    renders = 0
+
+    def html_parts(self):
+        self.renders += 1
+        return super(RenderCountingComponentHtml, self).html_parts()
+
+
+class SynchronousFuture(object):
+
+    def __init__(self, result):
+        self._result = result
+
+    def result(self):
+        return self._result
+
+
+class SynchronousExecutor(object):
+
+    def __init__(self):
+        self.submitted = []
+
+    def submit(self, function, *args):
+        "Arguments are pickled, as they are sent to other processes."
+        self.submitted.append(args[0])
+        return SynchronousFuture(function(*pickle.loads(pickle.dumps(args, pickle.HIGHEST_PROTOCOL))))
+
+
+class PendingFuture(object):
+
+    def __init__(self, result=None, exception=None):
+        self._result = result
+        self._exception = exception
+        self._done = False
+
+    def done(self):
+        return self._done
+
+    def finish(self):
+        self._done = True
+
+    def result(self):
+        assert self._done
+        if self._exception is not None:
+            raise self._exception
+        return self._result
+
+
+class AsyncIterator(object):
+    "Returns PendingFutures of @items, then one with StopAsyncIteration."
+
+    def __init__(self, items):
+        self.items = iter(items)
+
+    def __anext__(self):
+        try:
+            return PendingFuture(next(self.items))
+        except StopIteration:
+            return PendingFuture(exception=StopAsyncIteration())
+
+
+def run_async(component, chunk_size=1):
+    "Renders with async_iter_html, finishing the futures as an event loop would."
+    chunks = []
+    futures = 0
+    for chunk in component.async_iter_html(chunk_size=chunk_size):
+        if isinstance(chunk, PendingFuture):
+            futures += 1
+            chunk.finish()
+        else:
+            chunks.append(chunk)
+    return chunks, futures
+
 
 class ComponentHtmlInstanceTests(TestCase):
     
@@ -61,7 +166,234 @@ class ComponentHtmlInstanceTests(TestCase):
         self.component = ComponentHtml('x', 'y', a='b')
         self.component.set('a', 'c')
         self.assertEquals('c', self.component.get('a'))
-        
+
+    def test_components_without_attributes_do_not_share_attributes_after_set(self):
+        self.component = ComponentHtml('x')
+        other = ComponentHtml('x')
+        self.component.set('a', 'b')
+        self.assertEquals(None, other.get('a'))
+        self.assertEquals('<x></x>', other.as_html())
+
+    def test_components_have_no_instance_dict(self):
+        self.assertFalse(hasattr(ComponentHtml('x'), '__dict__'))
+        self.assertFalse(hasattr(Table(), '__dict__'))
+
+    def test_children_are_rendered_when_the_root_is_rendered(self):
+        self.component = ComponentHtml('x')
+        child = ComponentHtml('y')
+        self.component.add_component(child)
+        child.set('a', 'b')
+        child.add_component('z')
+        self.assertEquals('<x><y a="b">z</y></x>', self.component.as_html())
+
+    def test_iter_html_yields_the_fragments_in_document_order(self):
+        self.component = ComponentHtml('x', 'y')
+        self.component.add_component(ComponentHtml('z'))
+        self.assertEquals(['<x>', 'y', '<z>', '</z>', '</x>'], list(self.component.iter_html()))
+
+    def test_iter_chunks_groups_fragments(self):
+        self.component = ComponentHtml('x', 'y')
+        self.assertEquals([b'<x>y', b'</x>'], list(self.component.iter_chunks(chunk_size=4)))
+        self.assertEquals([u'<x>y</x>'], list(self.component.iter_chunks(encoding=None)))
+
+    def test_write_to_writes_encoded_html(self):
+        self.component = ComponentHtml('x', u'\xe7')
+        stream = BytesIO()
+        self.component.write_to(stream, chunk_size=1)
+        self.assertEquals(u'<x>\xe7</x>'.encode('utf-8'), stream.getvalue())
+
+    def test_write_to_flushes_every_chunk(self):
+        class Stream(object):
+            def __init__(self):
+                self.writes = []
+            def write(self, data):
+                self.writes.append(data)
+            def flush(self):
+                self.writes.append('flush')
+        stream = Stream()
+        ComponentHtml('x', 'y').write_to(stream, chunk_size=4)
+        self.assertEquals([b'<x>y', 'flush', b'</x>', 'flush'], stream.writes)
+
+    def test_as_bytes_encodes_the_html(self):
+        self.component = ComponentHtml('x', u'\xe7')
+        self.component.add_component(ComponentHtml('y', a=u'\xe3'))
+        self.assertEquals(self.component.as_html().encode('utf-8'), self.component.as_bytes())
+        self.assertEquals(self.component.as_html().encode('latin-1'), self.component.as_bytes('latin-1'))
+
+    def test_render_bytes_writes_into_bytearrays_lists_and_streams(self):
+        self.component = ComponentHtml('x', u'\xe7')
+        html = u'<x>\xe7</x>'.encode('utf-8')
+        buffer = bytearray()
+        self.component.render_bytes(buffer)
+        self.assertEquals(html, bytes(buffer))
+        buffers = []
+        self.component.render_bytes(buffers)
+        self.assertEquals(html, b''.join(buffers))
+        stream = BytesIO()
+        self.component.render_bytes(stream)
+        self.assertEquals(html, stream.getvalue())
+
+    def test_static_fragments_are_encoded_once(self):
+        ComponentHtml.register_static_fragments(u'<static>')
+        self.component = ComponentHtml('x', u'<static>')
+        encoded = ComponentHtml._utf8_fragments[u'<static>']
+        self.assertTrue(any(data is encoded for data in self.component.iter_bytes()))
+        del ComponentHtml._utf8_fragments[u'<static>']
+
+    def test_rendering_again_reuses_the_html_of_unchanged_components(self):
+        self.component = ComponentHtml('x')
+        unchanged = RenderCountingComponentHtml('y', ComponentHtml('z'))
+        changed = ComponentHtml('y', ComponentHtml('z'))
+        self.component.add_component(unchanged)
+        self.component.add_component(changed)
+        self.assertEquals('<x><y><z></z></y><y><z></z></y></x>', self.component.as_html())
+        self.assertEquals('<x><y><z></z></y><y><z></z></y></x>', self.component.as_html())
+        self.assertEquals(1, unchanged.renders)
+        changed.children[0].set('a', 'b')
+        self.assertEquals('<x><y><z></z></y><y><z a="b"></z></y></x>', self.component.as_html())
+
+    def test_changes_of_components_shared_by_many_parents_are_rendered(self):
+        child = ComponentHtml('y', ComponentHtml('z'))
+        parents = [ComponentHtml('x', child), ComponentHtml('x', child)]
+        for parent in parents:
+            parent.as_html()
+        child.add_component('w')
+        for parent in parents:
+            self.assertEquals('<x><y><z></z>w</y></x>', parent.as_html())
+
+    def test_pickled_components_render_the_same_html(self):
+        self.component = ComponentHtml('x', ComponentHtml('y', 'z', a='b'))
+        self.component.add_css_library('a.css')
+        copy = pickle.loads(pickle.dumps(self.component, pickle.HIGHEST_PROTOCOL))
+        self.assertEquals(self.component.as_html(), copy.as_html())
+        self.assertEquals(['a.css'], list(copy.css_libraries))
+        copy.children[0].set('a', 'c')
+        self.assertEquals('<x><y a="c">z</y></x>', copy.as_html())
+
+    def test_render_parallel_sends_the_smallest_big_subtrees_to_the_executor(self):
+        self.component = ComponentHtml('x', 'y')
+        big = [ComponentHtml('p', ComponentHtml('z', i)) for i in range(3)]
+        for child in big:
+            self.component.add_component(child)
+        self.component.add_component(ComponentHtml('w'))
+        executor = SynchronousExecutor()
+        html = self.component.render_parallel(executor=executor, min_subtree_size=2)
+        self.assertEquals(self.component.as_html(), html)
+        self.assertEquals(big, executor.submitted)
+
+    def test_render_parallel_renders_small_trees_in_this_process(self):
+        self.component = ComponentHtml('x', ComponentHtml('y'))
+        executor = SynchronousExecutor()
+        self.assertEquals('<x><y></y></x>', self.component.render_parallel(executor=executor, min_subtree_size=10))
+        self.assertEquals([], executor.submitted)
+
+    def test_clone_shares_the_nodes_until_they_change(self):
+        self.component = ComponentHtml('x', ComponentHtml('y', 'z'), a='b')
+        clone = self.component.clone()
+        self.assertTrue(clone._children is self.component._children)
+        self.assertTrue(clone.kwargs is self.component.kwargs)
+        clone.set('a', 'c')
+        clone.add_component('w')
+        self.component.add_css_library('a.css')
+        self.assertEquals('<x a="b"><y>z</y></x>', self.component.as_html())
+        self.assertEquals('<x a="c"><y>z</y>w</x>', clone.as_html())
+        self.assertEquals((), clone.css_libraries)
+
+    def test_descendants_reached_through_the_clone_are_cloned(self):
+        self.component = ComponentHtml('x', ComponentHtml('y', ComponentHtml('z')))
+        self.component.as_html()
+        clone = self.component.clone()
+        clone.children[0].children[0].set('a', 'b')
+        self.assertEquals('<x><y><z></z></y></x>', self.component.as_html())
+        self.assertEquals('<x><y><z a="b"></z></y></x>', clone.as_html())
+        self.component.children[0].add_component('w')
+        self.assertEquals('<x><y><z></z>w</y></x>', self.component.as_html())
+        self.assertEquals('<x><y><z a="b"></z></y></x>', clone.as_html())
+
+    def test_changes_of_the_cloned_component_are_not_seen_by_the_clone(self):
+        for rendered in (False, True):
+            self.component = ComponentHtml('x', ComponentHtml('y', ComponentHtml('z')))
+            if rendered:
+                self.component.as_html()
+            clone = self.component.clone()
+            self.component.children[0].set('a', 'b')
+            self.component.children[0].children[0].add_component('w')
+            self.assertEquals('<x><y a="b"><z>w</z></y></x>', self.component.as_html())
+            self.assertEquals('<x><y><z></z></y></x>', clone.as_html())
+            clone.children[0].set('c', 'd')
+            self.assertEquals('<x><y a="b"><z>w</z></y></x>', self.component.as_html())
+            self.assertEquals('<x><y c="d"><z></z></y></x>', clone.as_html())
+
+    def test_references_taken_before_the_clone_change_only_the_cloned_tree(self):
+        self.component = Panel()
+        child = Panel('x')
+        self.component.add_component(child)
+        grandchild = Panel('y')
+        child.add_component(grandchild)
+        self.component.as_html()
+        clone = self.component.clone()
+        grandchild.set('a', '1')
+        self.assertEquals('<div><div>x<div a="1">y</div></div></div>', self.component.as_html())
+        child.set('b', '2')
+        self.assertEquals('<div><div b="2">x<div a="1">y</div></div></div>', self.component.as_html())
+        self.assertEquals('<div><div>x<div>y</div></div></div>', clone.as_html())
+        clone.children[0].children[1].set('c', '3')
+        self.assertEquals('<div><div b="2">x<div a="1">y</div></div></div>', self.component.as_html())
+        self.assertEquals('<div><div>x<div c="3">y</div></div></div>', clone.as_html())
+
+    def test_clones_of_clones_keep_the_descendants_changed_in_the_cloned_tree(self):
+        self.component = ComponentHtml('x', ComponentHtml('y'))
+        child = self.component.children[0]
+        clone = self.component.clone()
+        other = clone.clone()
+        child.set('a', 'b')
+        self.assertEquals('<x><y a="b"></y></x>', self.component.as_html())
+        self.assertEquals('<x><y></y></x>', clone.as_html())
+        self.assertEquals('<x><y></y></x>', other.as_html())
+
+    def test_deep_trees_do_not_reach_the_recursion_limit(self):
+        self.component = ComponentHtml('x')
+        node = self.component
+        for _ in range(5000):
+            child = ComponentHtml('x')
+            node.add_component(child)
+            node = child
+        self.assertEquals('<x>' * 5001 + '</x>' * 5001, self.component.as_html())
+
+    def test_html_kept_by_deep_trees_is_not_copied_at_every_level(self):
+        self.component = ComponentHtml('x')
+        nodes = [self.component]
+        for _ in range(5000):
+            child = ComponentHtml('x', u'y' * 40)
+            nodes[-1].add_component(child)
+            nodes.append(child)
+        html = u'<x>' + (u'<x>' + u'y' * 40) * 5000 + u'</x>' * 5001
+        self.assertEquals(html, self.component.as_html())
+        kept_characters = sum(len(node._html) for node in nodes if isinstance(node._html, unicode))
+        self.assertTrue(kept_characters < 2 * len(html))
+        self.assertEquals(html, self.component.as_html())
+        self.assertEquals(html, u''.join(self.component.iter_html()))
+        self.assertEquals(u'<p>%s</p>' % html, u''.join(ComponentHtml('p', self.component).iter_html()))
+        self.assertEquals(u'<p>%s</p>' % html, u''.join(run_async(ComponentHtml('p', self.component))[0]))
+        nodes[-1].set('a', 'b')
+        self.assertEquals(html.replace(u'<x>' + u'y' * 40 + u'</x>', u'<x a="b">' + u'y' * 40 + u'</x>'),
+                          self.component.as_html())
+
+    def test_attributes_are_rendered_in_the_order_of_the_first_version_after_set(self):
+        names = ['a', 'c', 'width', 'maxlength', 'title', 'name', 'id', 'style', 'href', 'rel']
+        generator = random.Random(1)
+        for _ in range(300):
+            attributes = dict((name, u'v') for name in generator.sample(names, generator.randint(0, 6)))
+            component = ComponentHtml('x', 'y', **attributes)
+            simple_component = SimpleComponentHtml('x', **attributes)
+            first_version_kwargs = (lambda **kwargs: kwargs)(**attributes)
+            for name in generator.sample(names, generator.randint(1, 6)):
+                component.set(name, u'w')
+                simple_component.set(name, u'w')
+                first_version_kwargs[name] = u'w'
+            self.assertEquals(first_version_tag('x', 'y', **first_version_kwargs), component.as_html())
+            self.assertEquals(first_version_simple_tag('x', **first_version_kwargs), simple_component.as_html())
+
 
 class ImageTests(TestCase):
     
@@ -216,6 +548,167 @@ class TableTests(TestCase):
         table.add_cell('z')
         self.assertEquals('<table><thead></thead><tbody><tr class="odd"><td>x</td><td>y</td></tr><tr class="even"><td>z</td></tr></tbody></table>', table.as_html())
 
+    def test_rows_can_be_streamed_from_an_iterator(self):
+        table = Table.from_rows((('x', i) for i in range(3)), columns=['a', 'b'])
+        self.assertEquals('<table><thead><tr><th>a</th><th>b</th></tr></thead><tbody>'
+                          '<tr class="odd"><td>x</td><td>0</td></tr>'
+                          '<tr class="even"><td>x</td><td>1</td></tr>'
+                          '<tr class="odd"><td>x</td><td>2</td></tr>'
+                          '</tbody></table>', table.as_html())
+
+    def test_streamed_rows_continue_the_striping_and_accept_components(self):
+        table = Table()
+        table.add_cell('x')
+        table.stream_rows([[Image('y')]])
+        self.assertEquals('<table><thead></thead><tbody><tr class="odd"><td>x</td></tr>'
+                          '<tr class="even"><td><img src="y"/></td></tr></tbody></table>', table.as_html())
+
+    def test_lines_added_after_streamed_rows_continue_their_striping(self):
+        table = Table()
+        table.stream_rows([[1]])
+        table.add_cell('x')
+        table.add_rows([[2], [3]])
+        self.assertEquals('<table><thead></thead><tbody><tr class="odd"><td>1</td></tr>'
+                          '<tr class="even"><td>x</td></tr><tr class="odd"><td>2</td></tr>'
+                          '<tr class="even"><td>3</td></tr></tbody></table>', table.as_html())
+
+    def test_lines_after_streamed_rows_are_striped_by_the_rows_of_each_render(self):
+        rows = [[1]]
+        table = Table()
+        table.stream_rows(rows)
+        table.add_cell('x')
+        table.as_html()
+        rows.append([2])
+        self.assertEquals('<table><thead></thead><tbody><tr class="odd"><td>1</td></tr>'
+                          '<tr class="even"><td>2</td></tr><tr class="odd"><td>x</td></tr></tbody></table>',
+                          table.as_html())
+
+    def test_changes_of_the_component_cells_of_rows_are_rendered(self):
+        table = Table()
+        chunk = Chunk('a')
+        chunk.add_css_library('a.css')
+        table.add_rows([[chunk, 1]])
+        table.as_html()
+        chunk.set('title', 'T')
+        self.assertEquals('<table><thead></thead><tbody><tr class="odd"><td><span title="T">a</span></td>'
+                          '<td>1</td></tr></tbody></table>', table.as_html())
+        self.assertEquals(['a.css'], table.collect_assets().css_libraries)
+
+    def test_text_cells_are_escaped(self):
+        table = Table()
+        table.add_cell_on_header('<a>')
+        table.add_cell('<b>')
+        table.add_cell(Markup('<i>x</i>'))
+        self.assertEquals('<table><thead><tr><th>&lt;a&gt;</th></tr></thead><tbody>'
+                          '<tr class="odd"><td>&lt;b&gt;</td><td><i>x</i></td></tr></tbody></table>', table.as_html())
+
+    def test_streamed_text_cells_are_escaped(self):
+        table = Table()
+        table.stream_rows([['<', 1], ['&', Image('y'), Markup('<br/>')]])
+        self.assertEquals('<table><thead></thead><tbody><tr class="odd"><td>&lt;</td><td>1</td></tr>'
+                          '<tr class="even"><td>&amp;</td><td><img src="y"/></td><td><br/></td></tr></tbody></table>',
+                          table.as_html())
+
+    def test_rows_are_rendered_without_cell_components_and_keep_the_striping(self):
+        table = Table()
+        table.add_cell('x')
+        table.add_row(['<', 1])
+        table.add_rows([[2], [3]])
+        table.add_cell('y')
+        self.assertEquals('<table><thead></thead><tbody><tr class="odd"><td>x</td></tr>'
+                          '<tr class="even"><td>&lt;</td><td>1</td></tr>'
+                          '<tr class="odd"><td>2</td></tr><tr class="even"><td>3</td></tr>'
+                          '<tr class="odd"><td>y</td></tr></tbody></table>', table.as_html())
+
+    def test_rows_added_after_rendering_are_rendered(self):
+        table = Table()
+        table.add_row([1])
+        table.as_html()
+        table.add_row([2])
+        self.assertEquals('<table><thead></thead><tbody><tr class="odd"><td>1</td></tr>'
+                          '<tr class="even"><td>2</td></tr></tbody></table>', table.as_html())
+
+    def test_rows_accept_cell_attributes_and_formatters(self):
+        table = Table()
+        table.add_row([1, 2], cell_attrs={'clazz': 'n'})
+        table.add_row([1, Image('y'), 3], cell_attrs=[None, {'clazz': 'i'}], formatters=[None, None, '%.1f'.__mod__])
+        self.assertEquals('<table><thead></thead><tbody><tr class="odd"><td class="n">1</td><td class="n">2</td></tr>'
+                          '<tr class="even"><td>1</td><td class="i"><img src="y"/></td><td>3.0</td></tr></tbody></table>',
+                          table.as_html())
+
+    def test_table_from_columns(self):
+        table = Table.from_columns([('a', [1, 2]), ('b', ['x', 'y'])], formatters={'a': '#%s'.__mod__})
+        self.assertEquals('<table><thead><tr><th>a</th><th>b</th></tr></thead><tbody>'
+                          '<tr class="odd"><td>#1</td><td>x</td></tr>'
+                          '<tr class="even"><td>#2</td><td>y</td></tr></tbody></table>', table.as_html())
+
+    def test_cloned_tables_continue_their_own_lines(self):
+        table = Table()
+        table.add_cell_on_header('h')
+        table.add_cell('x')
+        table.add_row([1])
+        clone = table.clone()
+        clone.add_row([2])
+        clone.add_cell('y')
+        table.add_cell('z')
+        self.assertEquals('<table><thead><tr><th>h</th></tr></thead><tbody><tr class="odd"><td>x</td></tr>'
+                          '<tr class="even"><td>1</td></tr><tr class="odd"><td>z</td></tr></tbody></table>', table.as_html())
+        self.assertEquals('<table><thead><tr><th>h</th></tr></thead><tbody><tr class="odd"><td>x</td></tr>'
+                          '<tr class="even"><td>1</td></tr><tr class="odd"><td>2</td></tr>'
+                          '<tr class="even"><td>y</td></tr></tbody></table>', clone.as_html())
+
+    def test_rendering_twice_does_not_add_new_lines(self):
+        table = Table()
+        table.add_cell_on_header('x')
+        table.add_cell('y')
+        self.assertEquals(table.as_html(), table.as_html())
+
+
+class AsyncRenderingTests(TestCase):
+
+    def test_trees_without_futures_render_the_same_html(self):
+        panel = Panel(ComponentHtml('x', 'y', a='b'))
+        chunks, futures = run_async(panel, chunk_size=1000)
+        self.assertEquals([panel.as_html()], chunks)
+        self.assertEquals(0, futures)
+
+    def test_html_before_a_future_is_yielded_before_it(self):
+        panel = Panel()
+        panel.add_component(ComponentHtml('x'))
+        panel.add_component(AsyncContent(PendingFuture(ComponentHtml('y'))))
+        chunks, futures = run_async(panel, chunk_size=1000)
+        self.assertEquals(['<div><x></x>', '<y></y></div>'], chunks)
+        self.assertEquals(1, futures)
+
+    def test_exceptions_of_the_futures_are_raised(self):
+        panel = Panel(AsyncContent(PendingFuture(exception=ValueError())))
+        self.assertRaises(ValueError, run_async, panel)
+
+    def test_tables_stream_rows_of_asynchronous_iterators(self):
+        table = Table()
+        table.add_cell('x')
+        table.stream_rows_async(AsyncIterator([['<', 1], [2]]))
+        chunks, futures = run_async(table)
+        self.assertEquals('<table><thead></thead><tbody><tr class="odd"><td>x</td></tr>'
+                          '<tr class="even"><td>&lt;</td><td>1</td></tr><tr class="odd"><td>2</td></tr>'
+                          '</tbody></table>', ''.join(chunks))
+        self.assertEquals(3, futures)
+
+    def test_selects_stream_options_of_asynchronous_iterators(self):
+        select = Select('x')
+        select.add_option('a', 1)
+        select.add_options_async(AsyncIterator([('b', 2), ('<c>', 3)]), selected=[3])
+        chunks, _ = run_async(select)
+        self.assertEquals('<select name="x"><option value="1">a</option><option value="2">b</option>'
+                          '<option selected="selected" value="3">&lt;c&gt;</option></select>', ''.join(chunks))
+
+    def test_pages_with_futures_are_rendered_only_asynchronously(self):
+        page = Page('t', 'd', 'k')
+        page.body.add_component(AsyncContent(PendingFuture('x')))
+        self.assertRaises(TypeError, page.as_html)
+        chunks, _ = run_async(page)
+        self.assertTrue(''.join(chunks).endswith('<body>x</body></html>'))
+
 
 class FormTests(TestCase):
     
@@ -226,7 +719,71 @@ class FormTests(TestCase):
     def test_method_can_be_get(self):
         form = Form('x', method='get')
         self.assertEquals('<form action="x" method="get"></form>', form.as_html())
-        
+
+    def _form(self):
+        form = Form('x')
+        form.add_component_with_label(u'Name', TextBox(u'name', u''))
+        form.add_component(CheckBox(u'active'))
+        select = Select(u'color')
+        select.add_options([(u'Red', u'r'), (u'Blue', u'b')])
+        panel = Panel()
+        form.add_component(panel)
+        panel.add_component(select)
+        form.add_component(HiddenField(u'token', u't'))
+        return form
+
+    def test_values_of_the_fields_of_the_whole_form(self):
+        self.assertEquals({u'name': u'', u'active': False, u'color': None, u'token': u't'}, self._form().values())
+
+    def test_bind_sets_the_values_of_the_fields(self):
+        form = self._form()
+        form.bind({u'name': u'Ann', u'active': u'on', u'color': u'b', u'unknown': 1})
+        self.assertEquals({u'name': u'Ann', u'active': True, u'color': u'b', u'token': u't'}, form.values())
+        self.assertTrue(u'value="Ann"' in form.as_html())
+
+    def test_fields_added_after_the_index_is_built_are_indexed(self):
+        form = self._form()
+        form.fields()
+        form.add_component(TextArea(u'notes', u''))
+        form.bind({u'notes': u'n'})
+        self.assertEquals(u'n', form.values()[u'notes'])
+
+    def test_bind_of_a_clone_does_not_change_the_form(self):
+        form = self._form()
+        form.values()
+        clone = form.clone()
+        clone.bind({u'name': u'Bob'})
+        self.assertEquals(u'Bob', clone.values()[u'name'])
+        self.assertEquals(u'', form.values()[u'name'])
+
+    def test_bind_replaces_the_selected_options(self):
+        form = Form('x')
+        select = Select(u's')
+        select.add_option('a', u'1', selected=True)
+        select.add_option('b', u'2')
+        form.add_component(select)
+        form.bind({u's': u'2'})
+        self.assertEquals(u'2', form.values()[u's'])
+        self.assertEquals('<form action="x" method="post"><select name="s"><option value="1">a</option>'
+                          '<option selected="selected" value="2">b</option></select></form>', form.as_html())
+
+    def test_bind_replaces_the_values_of_multiple_selects(self):
+        form = Form('x')
+        select = Select(u's', multiple=True)
+        select.add_options([('a', u'1'), ('b', u'2')])
+        form.add_component(select)
+        form.bind({u's': [u'1']})
+        form.bind({u's': [u'2']})
+        self.assertEquals([u'2'], form.values()[u's'])
+
+    def test_subclasses_of_the_fields_are_indexed(self):
+        class NumberBox(TextBox):
+            __slots__ = ()
+        form = Form('x')
+        form.add_component(NumberBox(u'n', u'1'))
+        form.bind({u'n': u'2'})
+        self.assertEquals({u'n': u'2'}, form.values())
+
         
 class TextBoxTests(TestCase):
     
@@ -282,6 +839,19 @@ class SelectTests(TestCase):
         component.add_option('a', 'b')
         self.assertEquals('<select name="x"><option value="b">a</option></select>', component.as_html())
         
+    def test_labels_and_values_are_escaped(self):
+        component = Select('x')
+        component.add_option('<a>', '"b"')
+        self.assertEquals('<select name="x"><option value="&#34;b&#34;">&lt;a&gt;</option></select>', component.as_html())
+
+    def test_can_add_many_options(self):
+        component = Select('x')
+        component.add_options([('<a>', 1), (ComponentHtml('b'), 2)])
+        component.set('value', 2)
+        self.assertEquals('<select name="x"><option value="1">&lt;a&gt;</option>'
+                          '<option selected="selected" value="2"><b></b></option></select>', component.as_html())
+        self.assertEquals(2, component.get('value'))
+
     def test_can_add_selected_options(self):
         component = Select('x')
         component.add_option('a', 'b', selected=True)
@@ -306,10 +876,132 @@ class SelectTests(TestCase):
         component.set('value', 'b')
         self.assertEquals('b', component.get('value'))
     
+    def test_values_set_in_clones_do_not_change_the_cloned_select(self):
+        component = Select('x')
+        component.add_option('a', 'b')
+        component.add_option('c', 'd')
+        clone = component.clone()
+        clone.set('value', 'd')
+        other = component.clone()
+        other.children
+        other.set('value', 'b')
+        self.assertEquals(None, component.get('value'))
+        self.assertEquals('d', clone.get('value'))
+        self.assertEquals('b', other.get('value'))
+        self.assertEquals('<select name="x"><option value="b">a</option><option value="d">c</option></select>', component.as_html())
+        self.assertEquals('<select name="x"><option value="b">a</option><option selected="selected" value="d">c</option></select>', clone.as_html())
+
     def test_get_value_return_list_of_values_if_multiple_selection_is_true(self):
         component = Select('x', multiple=True)
         component.add_option('a', 'b')
         self.assertEquals([], component.get('value'))
         component.set('value', ['b'])
         self.assertEquals(['b'], component.get('value'))
-        
\ No newline at end of file
+
+    def test_get_value_return_selected_values_in_the_order_of_the_options(self):
+        component = Select('x', multiple=True)
+        for value in range(1000):
+            component.add_option('a', value, selected=value == 999)
+        component.set('value', ['500', '3', 'inexistent'])
+        self.assertEquals([3, 500, 999], component.get('value'))
+
+    def test_set_single_value_select_every_option_with_the_value(self):
+        component = Select('x', multiple=True)
+        component.add_option('a', 'b')
+        component.add_option('c', 'b')
+        component.add_option('d', 1)
+        component.set('value', 'b')
+        component.set('value', '1')
+        self.assertEquals(['b', 'b'], component.get('value'))
+
+        
+
+class PageTests(TestCase):
+
+    def setUp(self):
+        self.page = Page('t', 'd', 'k', doc_type=Page.HTML5_DOCTYPE)
+
+    def head_html(self, html):
+        return html[html.index('<head>'):html.index('</head>') + len('</head>')]
+
+    def test_head_has_each_library_of_the_tree_once_in_first_seen_order(self):
+        for href in ['b.css', 'a.css', 'b.css']:
+            panel = Panel()
+            panel.add_css_library(href)
+            panel.add_javascript_library(href + '.js')
+            self.page.body.add_component(Panel(panel))
+        html = self.head_html(self.page.as_html())
+        self.assertEquals(1, html.count('href="a.css"'))
+        self.assertEquals(1, html.count('href="b.css"'))
+        self.assertTrue(html.index('b.css') < html.index('a.css'))
+        self.assertEquals(1, html.count('src="b.css.js"'))
+
+    def test_assets_added_after_the_component_was_added_are_collected(self):
+        panel = Panel()
+        self.page.body.add_component(panel)
+        panel.add_jquery_init_code('x();')
+        self.assertTrue('$(document).ready(function() { x(); });' in self.page.as_html())
+
+    def test_changes_are_rendered_after_the_page_was_rendered(self):
+        panel = Panel()
+        self.page.body.add_component(panel)
+        self.page.as_html()
+        panel.add_css_library('a.css')
+        self.page.head.title = 'u'
+        html = self.page.as_html()
+        self.assertTrue('href="a.css"' in html)
+        self.assertTrue('<title>u</title>' in html)
+
+    def test_as_bytes_renders_the_same_html_of_as_html(self):
+        self.page.body.add_component(Panel(u'\xe7'))
+        self.assertEquals(self.page.as_html().encode('utf-8'), self.page.as_bytes())
+
+    def test_render_parallel_renders_the_same_html_of_as_html(self):
+        for i in range(4):
+            panel = Panel()
+            panel.add_css_library('%s.css' % i)
+            for j in range(20):
+                panel.add_component(Panel(str(j)))
+            self.page.body.add_component(panel)
+        html = self.page.render_parallel(executor=SynchronousExecutor(), min_subtree_size=10)
+        self.assertEquals(self.page.as_html(), html)
+
+    def test_render_parallel_renders_the_head_with_the_assets_of_the_page(self):
+        panel = Panel('x')
+        panel.add_css_library('a.css')
+        panel.add_jquery_init_code('init();')
+        self.page.body.add_component(panel)
+        executor = SynchronousExecutor()
+        html = self.page.render_parallel(executor=executor, min_subtree_size=1)
+        self.assertEquals(self.page.as_html(), html)
+        self.assertTrue('href="a.css"' in html)
+        self.assertTrue('init();' in html)
+        self.assertFalse(self.page.head in executor.submitted)
+
+    def test_cloned_pages_have_their_own_head_and_body(self):
+        self.page.body.add_component(Panel('x'))
+        self.page.as_html()
+        clone = self.page.clone()
+        clone.head.title = 'u'
+        clone.body.add_component(Panel('y'))
+        self.assertFalse('<title>u</title>' in self.page.as_html())
+        self.assertEquals('<body><div>x</div></body>', self.page.body.as_html())
+        self.assertTrue(clone.as_html().endswith('<body><div>x</div><div>y</div></body></html>'))
+        self.assertTrue('<title>u</title>' in clone.as_html())
+
+    def test_references_to_the_body_taken_before_the_clone_change_only_the_page(self):
+        body = self.page.body
+        table = Table()
+        body.add_component(table)
+        self.page.as_html()
+        clone = self.page.clone()
+        self.assertTrue(self.page.body is body)
+        body.add_component(Panel('x'))
+        table.add_cell('new')
+        self.assertTrue(self.page.as_html().endswith(
+            '<body><table><thead></thead><tbody><tr class="odd"><td>new</td></tr></tbody></table><div>x</div></body></html>'))
+        self.assertTrue(clone.as_html().endswith('<body><table><thead></thead><tbody></tbody></table></body></html>'))
+
+    def test_rendering_twice_does_not_replicate_libraries(self):
+        self.page.body.add_css_library('a.css')
+        self.assertEquals(self.page.as_html(), self.page.as_html())
@@ -0,0 +1,53 @@
+from unittest import TestCase
+
+from html_objects.components import ComponentHtml, Fragment, InformationPanel, Page, Panel, Table
+from html_objects.diffing import LiveRenderer
+
+
+class LiveRendererTests(TestCase):
+
+    def test_tags_are_rendered_with_stable_ids(self):
+        panel = Panel(ComponentHtml(u'b', u'x'))
+        renderer = LiveRenderer(panel)
+        self.assertEquals(u'<div data-node="n1"><b data-node="n2">x</b></div>', renderer.render())
+        self.assertEquals(u'<div><b>x</b></div>', panel.as_html())
+        self.assertEquals([], renderer.diff())
+
+    def test_only_the_changed_components_are_sent(self):
+        info = InformationPanel()
+        info.add_info(u'cpu', u'10%')
+        table = Table()
+        table.add_cell(u'a')
+        page = Panel()
+        page.add_component(info)
+        page.add_component(table)
+        renderer = LiveRenderer(page)
+        renderer.render()
+        info.add_info(u'memory', u'1G')
+        table._body_line.children[0].set(u'title', u't')
+        patches = renderer.diff()
+        self.assertEquals([renderer.node_id(info), renderer.node_id(table._body_line.children[0])],
+                          [node_id for node_id, _ in patches])
+        self.assertTrue(patches[0][1].endswith(u'class="value">1G</span><br/></div>'))
+        self.assertEquals(u'<td data-node="%s" title="t">a</td>' % renderer.node_id(table._body_line.children[0]),
+                          patches[1][1])
+        self.assertEquals([], renderer.diff())
+
+    def test_components_without_tag_are_sent_with_their_parent(self):
+        fragment = Fragment(u'a')
+        panel = Panel(fragment)
+        renderer = LiveRenderer(panel)
+        renderer.render()
+        fragment.add_component(u'b')
+        self.assertEquals([(u'n1', u'<div data-node="n1">ab</div>')], renderer.diff())
+
+    def test_changed_root_without_id_replaces_the_document(self):
+        page = Page(u'T', u'D', u'K')
+        renderer = LiveRenderer(page)
+        renderer.render()
+        page.body.add_component(u'x')
+        self.assertEquals([renderer.node_id(page.body)], [node_id for node_id, _ in renderer.diff()])
+        page.head.title = u'U'
+        patches = renderer.diff()
+        self.assertEquals(1, len(patches))
+        self.assertEquals(None, patches[0][0])
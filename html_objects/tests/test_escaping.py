@@ -0,0 +1,35 @@
+from unittest import TestCase
+
+from html_objects.components import ComponentHtml
+from html_objects.escaping import Markup, escape, escape_many
+
+
+class EscapeTests(TestCase):
+
+    def test_special_characters_are_escaped(self):
+        self.assertEquals(u'&lt;a href=&#34;x&#39;&gt;&amp;', escape(u'<a href="x\'>&'))
+
+    def test_markup_is_not_escaped_again(self):
+        markup = escape(u'<')
+        self.assertTrue(isinstance(markup, Markup))
+        self.assertEquals(u'&lt;', escape(markup))
+        self.assertEquals(u'<b>', escape(Markup(u'<b>')))
+
+    def test_other_values_are_converted_to_unicode(self):
+        self.assertEquals(u'1', escape(1))
+        self.assertEquals(u'None', escape(None))
+
+    def test_objects_with_html_are_not_escaped(self):
+        self.assertEquals(u'<x></x>', escape(ComponentHtml('x')))
+
+
+class EscapeManyTests(TestCase):
+
+    def test_escapes_each_value(self):
+        self.assertEquals([u'&lt;', u'1', u'<b>', u'x'], escape_many([u'<', 1, Markup(u'<b>'), 'x']))
+
+    def test_values_without_special_characters_are_kept(self):
+        self.assertEquals([u'a', u'b'], escape_many([u'a', u'b']))
+
+    def test_values_with_the_separator_are_escaped_too(self):
+        self.assertEquals([u'&lt;\x00', u'&amp;'], escape_many([u'<\x00', u'&']))
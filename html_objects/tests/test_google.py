@@ -1,7 +1,8 @@
 from unittest import TestCase
 
 from html_objects.google import GoogleAdSenseComponent, GoogleAnalyticsComponent,\
-    GoogleMapsComponent
+    GoogleMapsComponent, EmbedComponent, Snippet, EMBEDS, register_embed
+from html_objects.escaping import Markup
     
 
 class GoogleAdSenseComponentTests(TestCase):
@@ -20,3 +21,49 @@ class GoogleMapsComponentTests(TestCase):
     
     def test_x(self):
         GoogleMapsComponent
+
+
+class SnippetTests(TestCase):
+
+    def test_parameters_are_replaced_and_escaped(self):
+        snippet = Snippet(u'<a href="%(url)e">%(text)s</a>')
+        self.assertEquals(u'<a href="?a=1&amp;b=2"><b>x</b></a>', snippet.render(url=u'?a=1&b=2', text=u'<b>x</b>'))
+
+    def test_html_of_the_same_values_is_kept(self):
+        snippet = Snippet(u'%(a)s', cache_size=1)
+        html = snippet.render(a=1)
+        self.assertTrue(html is snippet.render(a=1))
+        snippet.render(a=2)
+        self.assertFalse(html is snippet.render(a=1))
+
+    def test_equal_values_of_other_types_are_not_confused(self):
+        snippet = Snippet(u'%(a)e')
+        self.assertEquals(u'<b>', snippet.render(a=Markup(u'<b>')))
+        self.assertEquals(u'&lt;b&gt;', snippet.render(a=u'<b>'))
+        self.assertEquals(u'True', snippet.render(a=True))
+        self.assertEquals(u'1', snippet.render(a=1))
+
+
+class EmbedComponentTests(TestCase):
+
+    def test_components_render_their_snippets(self):
+        maps = GoogleMapsComponent(u'A & B')
+        self.assertTrue(maps.as_html().startswith(u'<div class="google-maps"><a href="http://maps.google.com/maps/'
+                                                  u'api/staticmap?center=A &amp; B&amp;zoom=16&amp;size=200x200'))
+        self.assertTrue(u"_gaq.push(['_setAccount', 'UA-1']);" in GoogleAnalyticsComponent(u'UA-1').as_html())
+
+    def test_deferred_scripts_are_loaded_asynchronously(self):
+        self.assertTrue(u'show_ads.js' in GoogleAdSenseComponent(u'c', u's', 1, 2).as_html())
+        deferred = GoogleAdSenseComponent(u'c', u's', 1, 2, defer=True, clazz=u'ad').as_html()
+        self.assertTrue(deferred.startswith(u'<div class="ad"><script async="async"'))
+        self.assertTrue(u'data-ad-client="c"' in deferred)
+
+    def test_new_embeds_are_registered(self):
+        register_embed('test-video', u'<iframe src="/video/%(id)e"></iframe>')
+        class Video(EmbedComponent):
+            __slots__ = ()
+            embed = 'test-video'
+        try:
+            self.assertEquals(u'<div><iframe src="/video/1"></iframe></div>', Video(dict(id=1)).as_html())
+        finally:
+            del EMBEDS['test-video']
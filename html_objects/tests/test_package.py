@@ -0,0 +1,20 @@
+import subprocess
+import sys
+from unittest import TestCase
+
+import html_objects
+from html_objects import components, google
+
+
+class LazyPackageTests(TestCase):
+
+    def test_names_are_the_ones_of_their_modules(self):
+        self.assertTrue(html_objects.Page is components.Page)
+        self.assertTrue(html_objects.GoogleMapsComponent is google.GoogleMapsComponent)
+        self.assertTrue('Table' in dir(html_objects))
+        self.assertRaises(AttributeError, getattr, html_objects, 'Unknown')
+
+    def test_modules_are_imported_when_the_names_are_used(self):
+        code = ('import sys, html_objects; before = "html_objects.components" in sys.modules; html_objects.Panel; '
+                'print(before, "html_objects.components" in sys.modules)')
+        self.assertEquals('(False, True)', subprocess.check_output([sys.executable, '-c', code]).strip())
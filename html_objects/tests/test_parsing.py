@@ -0,0 +1,92 @@
+from unittest import TestCase
+
+from html_objects.cache import LocalCacheBackend
+from html_objects.components import ComponentHtml, Fragment, Panel, Link, Image, Table, Form, TextBox, CheckBox,\
+    Select, SubmitButton, UnorderedList
+from html_objects.parsing import iter_parse, parse_html
+
+
+class ParseHtmlTests(TestCase):
+
+    def test_tags_are_parsed_into_the_components(self):
+        panel = ComponentHtml.from_html(u'<div class="a"><a href="/x">x</a><img src="i.png"/><em>e</em></div>')
+        self.assertTrue(isinstance(panel, Panel))
+        link, image, em = panel.children
+        self.assertTrue(isinstance(link, Link))
+        self.assertEquals(u'/x', link.get('href'))
+        self.assertTrue(isinstance(image, Image))
+        self.assertEquals(u'em', em.tag_name)
+        self.assertEquals(u'<div class="a"><a href="/x">x</a><img src="i.png"/><em>e</em></div>', panel.as_html())
+
+    def test_text_and_attributes_are_kept_escaped(self):
+        html = u'<p title="a &amp; b">1 &lt; 2 &#38; <!-- c --></p>'
+        self.assertEquals(html, parse_html(html, cache=None).as_html())
+
+    def test_many_top_level_nodes_are_a_fragment(self):
+        fragment = parse_html(u'text <span>s</span>', cache=None)
+        self.assertTrue(isinstance(fragment, Fragment))
+        self.assertEquals(u'text <span>s</span>', fragment.as_html())
+
+    def test_form(self):
+        form = parse_html(u'<form action="/s" method="get">'
+                          u'<input type="text" name="q" value="v"/><input type="checkbox" name="c" checked>'
+                          u'<select name="o"><option value="1">One</option> <option selected>2</option></select>'
+                          u'<input type="submit" id="go" value="Go"/></form>', cache=None)
+        self.assertTrue(isinstance(form, Form))
+        self.assertEquals(u'get', form.get('method'))
+        text, check, select, submit = form.children
+        self.assertTrue(isinstance(text, TextBox))
+        self.assertEquals(u'v', text.get('value'))
+        self.assertTrue(isinstance(check, CheckBox))
+        self.assertTrue(check.get('value'))
+        self.assertTrue(isinstance(select, Select))
+        self.assertEquals(u'2', select.get('value'))
+        select.set(u'value', u'1')
+        self.assertEquals(u'1', select.get('value'))
+        self.assertTrue(isinstance(submit, SubmitButton))
+
+    def test_table_lines_are_added_to_the_table(self):
+        table = parse_html(u'<table>\n<thead><tr><th>h</th></tr></thead>\n'
+                           u'<tbody><tr class="x"><td>1</td></tr></tbody></table>', cache=None)
+        self.assertTrue(isinstance(table, Table))
+        table.add_cell(u'2')
+        self.assertEquals(u'<table><thead><tr><th>h</th></tr></thead>'
+                          u'<tbody><tr class="x"><td>1</td><td>2</td></tr></tbody></table>', table.as_html())
+
+    def test_captions_column_groups_and_footers_keep_their_position_in_the_table(self):
+        html = (u'<table><caption>C</caption><colgroup><col span="2"/></colgroup><thead><tr><th>h</th></tr></thead>'
+                u'<tfoot><tr><td>f</td></tr></tfoot><tbody><tr class="odd"><td>1</td></tr></tbody></table>')
+        self.assertEquals(html, parse_html(html, cache=None).as_html())
+        table = parse_html(u'<table><caption>C</caption><tr><td>1</td></tr><tfoot><tr><td>f</td></tr></tfoot></table>',
+                           cache=None)
+        self.assertEquals(u'<table><caption>C</caption><thead></thead><tbody><tr><td>1</td></tr></tbody>'
+                          u'<tfoot><tr><td>f</td></tr></tfoot></table>', table.as_html())
+
+    def test_list_items_are_not_wrapped_again(self):
+        ul = parse_html(u'<ul> <li>a</li> </ul>', cache=None)
+        self.assertTrue(isinstance(ul, UnorderedList))
+        self.assertEquals(u'<ul><li>a</li></ul>', ul.as_html())
+
+    def test_unclosed_tags_are_closed(self):
+        self.assertEquals(u'<div><p>a</p><p>b</p></div>', parse_html(u'<div><p>a</p><p>b', cache=None).as_html())
+
+    def test_markup_is_parsed_once_and_clones_are_returned(self):
+        cache = LocalCacheBackend()
+        first = parse_html(u'<div>a</div>', cache=cache)
+        second = parse_html(u'<div>a</div>', cache=cache)
+        self.assertFalse(first is second)
+        second.add_component(u'b')
+        self.assertEquals(u'<div>a</div>', first.as_html())
+        self.assertEquals(u'<div>ab</div>', second.as_html())
+        self.assertEquals(1, len(cache))
+
+
+class IterParseTests(TestCase):
+
+    def test_nodes_are_yielded_when_they_are_closed(self):
+        chunks = [u'<div>a</d', u'iv><p>b', u'</p>', u'<span>c</span>']
+        nodes = iter_parse(chunks)
+        self.assertEquals(u'<div>a</div>', next(nodes).as_html())
+        self.assertEquals(u'<p>b</p>', next(nodes).as_html())
+        self.assertEquals(u'<span>c</span>', next(nodes).as_html())
+        self.assertEquals([], list(nodes))
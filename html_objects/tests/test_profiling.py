@@ -0,0 +1,91 @@
+import os
+import pstats
+import tempfile
+from io import BytesIO
+from unittest import TestCase
+
+from html_objects.components import ComponentHtml, Panel, Page, Chunk, Head, Body
+from html_objects.profiling import RenderHook, RenderProfiler, profile_rendering
+
+
+class RecordingHook(RenderHook):
+
+    def __init__(self):
+        self.events = []
+
+    def component_rendered(self, component, parent, elapsed, own_elapsed, size):
+        self.events.append(('rendered', component, parent, size))
+
+    def component_reused(self, component, parent, size):
+        self.events.append(('reused', component, parent, size))
+
+
+class ProfileRenderingTests(TestCase):
+
+    def test_hook_is_called_for_every_component_only_inside_the_block(self):
+        chunk = Chunk('x')
+        panel = Panel(chunk)
+        with profile_rendering(RecordingHook()) as hook:
+            self.assertEquals('<div><span>x</span></div>', panel.as_html())
+            panel.as_html()
+        panel.changed()
+        panel.as_html()
+        self.assertEquals(None, ComponentHtml.render_hook)
+        self.assertEquals([('rendered', chunk, panel, 14), ('rendered', panel, None, 25), ('reused', panel, None, 25)],
+                          hook.events)
+
+    def test_streaming_renders_are_reported(self):
+        chunk = Chunk('x')
+        panel = Panel(chunk)
+        with profile_rendering(RecordingHook()) as hook:
+            self.assertEquals('<div><span>x</span></div>', u''.join(panel.iter_html()))
+        self.assertEquals([('rendered', chunk, panel, 14), ('rendered', panel, None, 25)], hook.events)
+        panel.as_html()
+        for render in (lambda: panel.as_bytes(), lambda: panel.write_to(BytesIO())):
+            with profile_rendering(RecordingHook()) as hook:
+                render()
+            self.assertEquals([('reused', panel, None, 25)], hook.events)
+
+
+class RenderProfilerTests(TestCase):
+
+    def setUp(self):
+        self.page = Page('t', 'd', 'k')
+        panel = Panel(Panel(Chunk('x')))
+        panel.add_css_library('a.css')
+        self.page.body.add_component(panel)
+
+    def test_records_per_class(self):
+        with profile_rendering(RenderProfiler(instances=True)) as profiler:
+            html = self.page.as_html()
+        summary = profiler.summary()
+        panels = summary['classes']['html_objects.components.Panel']
+        self.assertEquals(2, panels['renders'])
+        self.assertEquals(2, panels['children'])
+        self.assertEquals(1, panels['assets'])
+        self.assertEquals(len(html), summary['classes']['html_objects.components.Page']['size'])
+        self.assertEquals(len(profiler.components), sum(record['renders'] for record in summary['classes'].values()))
+        self.assertTrue(panels['time'] <= summary['time'])
+        self.assertTrue('"renders": 2' in profiler.to_json())
+
+    def test_the_head_of_pages_is_reported(self):
+        with profile_rendering(RecordingHook()) as hook:
+            html = self.page.as_html()
+        rendered = [(type(event[1]), type(event[2])) for event in hook.events]
+        self.assertTrue((Head, Page) in rendered)
+        self.assertTrue((Body, Page) in rendered)
+        head = self.page.head.as_html()
+        self.assertTrue(u'a.css' in head and head in html)
+        self.assertEquals([len(head)], [event[3] for event in hook.events if type(event[1]) is Head])
+
+    def test_stats_can_be_loaded_by_pstats(self):
+        with profile_rendering() as profiler:
+            self.page.as_html()
+        stats = pstats.Stats(profiler)
+        self.assertEquals(2, stats.stats[('html_objects.components', 0, 'Panel')][1])
+        filename = tempfile.mktemp()
+        try:
+            profiler.dump_stats(filename)
+            self.assertEquals(stats.stats.keys(), pstats.Stats(filename).stats.keys())
+        finally:
+            os.remove(filename)
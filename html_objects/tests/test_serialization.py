@@ -0,0 +1,125 @@
+import pickle
+import tempfile
+from unittest import TestCase
+
+from html_objects.components import ComponentHtml, AsyncContent, Image, Link, Paragraph, UnorderedList, OrderedList,\
+    Chunk, Fragment, Panel, InformationPanel, Table, Form, TextBox, TextArea, CheckBox, UploadBox, Select,\
+    SubmitButton, HiddenField, Button, Page
+from html_objects.escaping import Markup
+from html_objects.google import GoogleAdSenseComponent, GoogleAnalyticsComponent, GoogleMapsComponent
+from html_objects.serialization import dumps, loads, dump, load
+
+
+def page():
+    page = Page(u'Title', u'Description', u'k1, k2', favicon=u'/favicon.ico')
+    page.add_css_library(u'/style.css')
+    page.body.add_jquery_init_code(u'init();')
+    page.body.add_component(Link(u'/', u'Home', target=u'_blank'))
+    page.body.add_component(Paragraph(Markup(u'<b>bold</b>')))
+    page.body.add_component(Image(u'/i.png', alt=u'i'))
+    items = UnorderedList()
+    items.add_component(u'a')
+    items.add_component(Chunk(u'b'))
+    page.body.add_component(items)
+    ordered = OrderedList(clazz=u'o')
+    ordered.add_component(u'1')
+    page.body.add_component(ordered)
+    info = InformationPanel(label_class=u'label')
+    info.add_info(u'cpu', u'10%')
+    page.body.add_component(info)
+    table = Table(clazz=u't')
+    table.add_cell_on_header(u'h')
+    table.add_cell(u'<1>')
+    table.add_rows([[1, u'x'], [2.5, None]])
+    page.body.add_component(table)
+    form = Form(u'/save')
+    form.add_component_with_label(u'Name', TextBox(u'name', u'n'))
+    form.add_component(TextArea(u'notes', u'text'))
+    form.add_component(CheckBox(u'active'))
+    form.add_component(UploadBox(u'file', u''))
+    select = Select(u'color', multiple=True)
+    select.add_options([(u'Red', u'r'), (u'Blue', u'b')])
+    select.set(u'value', u'b')
+    form.add_component(select)
+    form.add_component(HiddenField(u'token', u't'))
+    form.add_component(SubmitButton(u'save', u'Save'))
+    form.add_component(Button(u'cancel'))
+    page.body.add_component(form)
+    page.body.add_component(Fragment(u'fragment'))
+    page.body.add_component(GoogleAdSenseComponent(u'client', u'slot', 200, 100))
+    page.body.add_component(GoogleAnalyticsComponent(u'UA-1'))
+    page.body.add_component(GoogleMapsComponent(u'Street'))
+    return page
+
+
+class SerializationTests(TestCase):
+
+    def test_every_component_is_restored(self):
+        original = page()
+        restored = loads(dumps(original))
+        self.assertEquals(original.as_html(), restored.as_html())
+        self.assertEquals([type(child) for child in original.body.children],
+                          [type(child) for child in restored.body.children])
+
+    def test_restored_tree_can_be_changed(self):
+        restored = loads(dumps(page()))
+        table = restored.body.children[6]
+        table.add_cell(u'new')
+        self.assertTrue(u'<td>new</td>' in restored.as_html())
+        select = restored.body.children[7].fields()[u'color']
+        self.assertEquals([u'b'], select.get(u'value'))
+        select.set(u'value', u'r')
+        self.assertEquals([u'r', u'b'], select.get(u'value'))
+
+    def test_strings_and_shared_components_are_stored_once(self):
+        chunk = Chunk(u'repeated text')
+        panel = Panel()
+        for _ in range(100):
+            panel.add_component(chunk)
+            panel.add_component(u'repeated text')
+        data = dumps(panel)
+        self.assertEquals(1, data.count(b'repeated text'))
+        restored = loads(data)
+        self.assertTrue(restored.children[0] is restored.children[2])
+        self.assertEquals(panel.as_html(), restored.as_html())
+
+    def test_markup_is_kept(self):
+        restored = loads(dumps(Panel(Markup(u'<b>x</b>'))))
+        self.assertTrue(isinstance(restored.children[0], Markup))
+
+    def test_smaller_than_pickle(self):
+        original = page()
+        self.assertTrue(len(dumps(original)) < len(pickle.dumps(original, pickle.HIGHEST_PROTOCOL)))
+
+    def test_indexes_of_the_select_options_are_rebuilt(self):
+        select = Select(u's', multiple=True)
+        select.add_options([(u'a', 1), (u'b', 2), (u'c', 2)])
+        select.set(u'value', [u'2'])
+        data = dumps(select)
+        restored = loads(data)
+        self.assertEquals([2], restored.get(u'value'))
+        restored.set(u'value', [u'1'])
+        self.assertEquals([1, 2], restored.get(u'value'))
+        self.assertEquals(select.as_html(), loads(data).as_html())
+        self.assertTrue(len(data) < len(pickle.dumps(select, pickle.HIGHEST_PROTOCOL)))
+
+    def test_deep_trees(self):
+        root = panel = Panel()
+        for _ in range(5000):
+            child = Panel()
+            panel.add_component(child)
+            panel = child
+        self.assertEquals(root.as_html(), loads(dumps(root)).as_html())
+
+    def test_files_are_loaded_with_mmap(self):
+        original = page()
+        with tempfile.TemporaryFile() as stream:
+            dump(original, stream)
+            stream.seek(0)
+            self.assertEquals(original.as_html(), load(stream).as_html())
+
+    def test_futures_cannot_be_serialized(self):
+        self.assertRaises(TypeError, dumps, Panel(AsyncContent(object())))
+
+    def test_other_data_is_rejected(self):
+        self.assertRaises(ValueError, loads, b'not a tree')
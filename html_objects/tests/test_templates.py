@@ -0,0 +1,49 @@
+from unittest import TestCase
+
+from html_objects.components import ComponentHtml, Panel, Page, Chunk
+from html_objects.templates import Slot
+
+
+class SlotTests(TestCase):
+
+    def test_slot_renders_the_default_content_without_tag(self):
+        panel = Panel(Slot('x', Chunk('y')))
+        self.assertEquals('<div><span>y</span></div>', panel.as_html())
+
+
+class TemplateTests(TestCase):
+
+    def test_template_without_slots_renders_the_compiled_html(self):
+        panel = Panel(Chunk('y'), clazz='x')
+        self.assertEquals(panel.as_html(), panel.compile().render())
+
+    def test_slots_are_replaced_by_the_values(self):
+        panel = Panel()
+        panel.add_component(Slot('a'))
+        panel.add_component(Chunk('y'))
+        panel.add_component(Slot('b', 'default'))
+        template = panel.compile()
+        self.assertEquals(['a', 'b'], template.slot_names)
+        self.assertEquals('<div>1<span>y</span><p>2</p></div>', template.render(a=1, b=ComponentHtml('p', '2')))
+        self.assertEquals('<div><span>y</span>default</div>', template.render())
+
+    def test_later_changes_of_the_tree_do_not_change_the_template(self):
+        panel = Panel(Slot('a'))
+        template = panel.compile()
+        panel.add_component('z')
+        self.assertEquals('<div>x</div>', template.render(a='x'))
+
+    def test_unknown_slots_are_not_accepted(self):
+        template = Panel(Slot('a')).compile()
+        self.assertRaises(TypeError, template.render, b='x')
+
+    def test_page_templates_have_the_assets_of_the_tree(self):
+        page = Page('t', 'd', 'k')
+        content = Panel()
+        content.add_css_library('a.css')
+        page.body.add_component(content)
+        page.body.add_component(Slot('content'))
+        page.as_html()
+        html = page.compile().render(content='x')
+        self.assertTrue('href="a.css"' in html)
+        self.assertTrue(html.endswith('<body><div></div>x</body></html>'))
@@ -38,7 +38,7 @@ setup(name='python-html-objects',
       install_requires=install_requires,
       tests_require=tests_require,
       test_suite='runtests.runtests',
-      extras_require={'test': tests_require},
+      extras_require={'test': tests_require, 'parallel': ['futures']},
 
-      packages=find_packages(),
+      packages=find_packages(exclude=['benchmarks']),
 )